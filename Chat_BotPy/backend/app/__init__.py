@@ -4,13 +4,25 @@ from flask import Flask
 from flasgger import Swagger
 from flask_pymongo import PyMongo
 from .config import settings
+from .utils.json_provider import OrjsonProvider
 
 mongo = PyMongo()
 
 def create_app() -> Flask:
     app = Flask(__name__)
+    app.json = OrjsonProvider(app) # dùng orjson cho parse/serialize JSON của request/response
     app.config [ 'MONGO_URI' ] = settings.MONGODB_URI
-    mongo.init_app(app) # khởi tạo instance của PyMongo chưa trong biến mongo theo config app
+    # khởi tạo instance của PyMongo chưa trong biến mongo theo config app,
+    # các tham số pool được truyền thẳng xuống MongoClient
+    mongo.init_app(
+        app,
+        maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=settings.MONGO_MAX_IDLE_TIME_MS,
+        waitQueueTimeoutMS=settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        retryWrites=settings.MONGO_RETRY_WRITES,
+    )
     Swagger_template = {
         'info': {
             'title': settings.APP_NAME,
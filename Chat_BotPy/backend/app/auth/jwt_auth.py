@@ -1,20 +1,50 @@
 # app/auth/jwt_auth.py
+import binascii
+import hashlib
+import json
+import threading
+import time
 from functools import wraps
+from typing import Any
 from flask import request, jsonify, g
-from jwt import PyJWKClient, InvalidTokenError, ExpiredSignatureError
-import jwt as pyjwt
+from cachetools import TTLCache
+from jwt import (
+    PyJWKClient,
+    InvalidTokenError,
+    ExpiredSignatureError,
+    DecodeError,
+    ImmatureSignatureError,
+    InvalidAlgorithmError,
+    InvalidAudienceError,
+    InvalidIssuedAtError,
+    InvalidIssuerError,
+    InvalidKeyError,
+    InvalidSignatureError,
+    MissingRequiredClaimError,
+)
+from jwt.algorithms import RSAAlgorithm
+from jwt.utils import base64url_decode
 
 from app.config import settings
 
-# lazy init jwks client
-_jwks_client = None
+def _build_jwks_client():
+    # the constructor does no network IO; the JWK set is fetched on first use
+    return PyJWKClient(settings.JWKS_URL, lifespan=settings.JWKS_CACHE_LIFESPAN)
+
+# created at import when configured; the lock guards the lazy fallback
+_jwks_client = _build_jwks_client() if settings.JWKS_URL else None
+_jwks_client_lock = threading.Lock()
 def get_jwks_client():
     global _jwks_client
-    if _jwks_client is None:
-        if not settings.JWKS_URL:
-            raise RuntimeError("JWKS_URL is not configured")
-        _jwks_client = PyJWKClient(settings.JWKS_URL)
-    return _jwks_client
+    client = _jwks_client
+    if client is None:
+        with _jwks_client_lock:
+            if _jwks_client is None:
+                if not settings.JWKS_URL:
+                    raise RuntimeError("JWKS_URL is not configured")
+                _jwks_client = _build_jwks_client()
+            client = _jwks_client
+    return client
 
 def get_token_from_header():
     auth = request.headers.get("Authorization", "")
@@ -25,41 +55,183 @@ def get_token_from_header():
         return parts[1]
     return None
 
+# public key objects keyed by kid, so the JWK is parsed once instead of per request
+_key_cache: dict[str, Any] = {}
+_key_cache_lock = threading.RLock()
+
+_RS256 = RSAAlgorithm(RSAAlgorithm.SHA256)
+_AUD = settings.KEYCLOAK_CLIENT_ID or None
+_ISS = settings.KEYCLOAK_ISSUER_URI or None
+
 def verify_jwt(token: str):
-    jwks_client = get_jwks_client()
-    signing_key = jwks_client.get_signing_key_from_jwt(token)
-    key = signing_key.key
-    options = {
-        "verify_signature": True,
-        "verify_aud": bool(settings.KEYCLOAK_CLIENT_ID),
-        "verify_exp": True,
-        "verify_iss": bool(settings.KEYCLOAK_ISSUER_URI)
-    }
-    decoded = pyjwt.decode(
-        token,
-        key=key,
-        algorithms=["RS256"],
-        audience=settings.KEYCLOAK_CLIENT_ID if settings.KEYCLOAK_CLIENT_ID else None,
-        issuer=settings.KEYCLOAK_ISSUER_URI if settings.KEYCLOAK_ISSUER_URI else None,
-        options=options
-    )
-    return decoded
+    """Verify an RS256 token and return its claims.
+
+    Same checks and error types as pyjwt.decode with our settings, but the
+    token is split and decoded only once and the signature is checked
+    directly against the cached RSA key.
+    """
+    header, payload, signing_input, signature = _split_jwt(token)
+    kid = header.get("kid")
+    if kid is not None and not isinstance(kid, str):
+        raise InvalidTokenError("Key ID header parameter must be a string")
+
+    alg = header.get("alg")
+    if "alg" not in header:
+        raise InvalidAlgorithmError("Algorithm not specified")
+    if alg != "RS256":
+        raise InvalidAlgorithmError("The specified alg value is not allowed")
+
+    if not _RS256.verify(signing_input, _get_signing_key(kid), signature):
+        # a failed check never evicts the cached key: forged tokens carrying a real kid
+        # must cost one RSA verify, not a JWKS rebuild (Keycloak rotates to a new kid)
+        raise InvalidSignatureError("Signature verification failed")
+
+    try:
+        claims = json.loads(payload)
+    except ValueError as e:
+        raise DecodeError(f"Invalid payload string: {e}")
+    if not isinstance(claims, dict):
+        raise DecodeError("Invalid payload string: must be a json object")
+    _validate_claims(claims)
+    return claims
+
+def _get_signing_key(kid):
+    with _key_cache_lock:
+        key = _key_cache.get(kid)
+    if key is not None:
+        return key
+    client = get_jwks_client()
+    try:
+        key = _RS256.prepare_key(client.get_signing_key(kid).key)
+    except (InvalidKeyError, TypeError):
+        # not a usable RSA key (RSAAlgorithm raises TypeError for other key types):
+        # the JWK set we hold may be stale, fetch it again once before giving up
+        client.get_signing_keys(refresh=True)
+        key = _RS256.prepare_key(client.get_signing_key(kid).key)
+    with _key_cache_lock:
+        _key_cache[kid] = key
+    return key
+
+def _split_jwt(token: str):
+    try:
+        signing_input, crypto_segment = token.encode("utf-8").rsplit(b".", 1)
+        header_segment, payload_segment = signing_input.split(b".", 1)
+    except ValueError as err:
+        raise DecodeError("Not enough segments") from err
+    try:
+        header = json.loads(base64url_decode(header_segment))
+    except (TypeError, binascii.Error) as err:
+        raise DecodeError("Invalid header padding") from err
+    except ValueError as e:
+        raise DecodeError(f"Invalid header string: {e}") from e
+    if not isinstance(header, dict):
+        raise DecodeError("Invalid header string: must be a json object")
+    try:
+        payload = base64url_decode(payload_segment)
+    except (TypeError, binascii.Error) as err:
+        raise DecodeError("Invalid payload padding") from err
+    try:
+        signature = base64url_decode(crypto_segment)
+    except (TypeError, binascii.Error) as err:
+        raise DecodeError("Invalid crypto padding") from err
+    return header, payload, signing_input, signature
+
+def _validate_claims(claims: dict):
+    # mirrors PyJWT's default checks: iat, nbf, exp, then iss/aud when configured
+    now = time.time()
+    if "iat" in claims:
+        try:
+            iat = int(claims["iat"])
+        except ValueError:
+            raise InvalidIssuedAtError("Issued At claim (iat) must be an integer.")
+        if iat > now:
+            raise ImmatureSignatureError("The token is not yet valid (iat)")
+    if "nbf" in claims:
+        try:
+            nbf = int(claims["nbf"])
+        except ValueError:
+            raise DecodeError("Not Before claim (nbf) must be an integer.")
+        if nbf > now:
+            raise ImmatureSignatureError("The token is not yet valid (nbf)")
+    if "exp" in claims:
+        try:
+            exp = int(claims["exp"])
+        except ValueError:
+            raise DecodeError("Expiration Time claim (exp) must be an integer.")
+        if exp <= now:
+            raise ExpiredSignatureError("Signature has expired")
+    if _ISS is not None:
+        if "iss" not in claims:
+            raise MissingRequiredClaimError("iss")
+        if claims["iss"] != _ISS:
+            raise InvalidIssuerError("Invalid issuer")
+    if _AUD is not None:
+        aud = claims.get("aud")
+        if not aud:
+            raise MissingRequiredClaimError("aud")
+        if isinstance(aud, str):
+            aud = [aud]
+        if not isinstance(aud, list) or any(not isinstance(a, str) for a in aud):
+            raise InvalidAudienceError("Invalid claim format in token")
+        if _AUD not in aud:
+            raise InvalidAudienceError("Audience doesn't match")
+
+# verified claims keyed by sha256(token); never keep raw tokens as keys
+_VERIFY_CACHE_TTL = settings.JWT_CACHE_TTL
+_verify_cache = TTLCache(maxsize=settings.JWT_CACHE_MAXSIZE, ttl=_VERIFY_CACHE_TTL)
+_verify_cache_lock = threading.RLock()
+
+def _verify_jwt_cached_entry(token: str):
+    """verify_jwt with a short-lived cache so repeated tokens skip RS256 verification.
+
+    Returns (claims, roles); the role frozenset is derived once per cache
+    entry. Entries never outlive the token's own `exp`. The returned claims
+    dict is shared between requests and must not be mutated.
+    """
+    cache_key = hashlib.sha256(token.encode()).digest()
+    now = time.time()
+    with _verify_cache_lock:
+        entry = _verify_cache.get(cache_key)
+    if entry is not None:
+        claims, roles, expires_at = entry
+        if expires_at > now:
+            return claims, roles
+
+    try:
+        claims = verify_jwt(token)
+    except InvalidTokenError:
+        with _verify_cache_lock:
+            _verify_cache.pop(cache_key, None)
+        raise
+
+    expires_at = now + _VERIFY_CACHE_TTL
+    exp = claims.get("exp")
+    if isinstance(exp, (int, float)):
+        expires_at = min(exp, expires_at)
+    roles = frozenset(extract_roles_from_claims(claims))
+    with _verify_cache_lock:
+        _verify_cache[cache_key] = (claims, roles, expires_at)
+    return claims, roles
+
+_ROLE_PREFIX = "ROLE_"
+_EMPTY_DICT: dict = {}  # shared read-only default, never mutated
 
 def extract_roles_from_claims(claims: dict):
     roles = set()
-    realm = claims.get("realm_access", {})
+    realm = claims.get("realm_access") or _EMPTY_DICT
     if isinstance(realm, dict):
-        r = realm.get("roles", [])
+        r = realm.get("roles", ())
         if isinstance(r, (list, tuple)):
-            for role in r:
-                roles.add("ROLE_" + str(role))
-    # Optionally extract client roles from resource_access if you use client roles
-    resource_access = claims.get("resource_access", {})
-    if isinstance(resource_access, dict):
-        for client, info in resource_access.items():
-            client_roles = info.get("roles", [])
-            for cr in client_roles:
-                roles.add("ROLE_" + str(cr))
+            roles = {f"{_ROLE_PREFIX}{role}" for role in r}
+    # Optionally extract client roles from resource_access if you use client roles.
+    # Most tokens carry no client roles, so skip the walk when it is absent/empty.
+    resource_access = claims.get("resource_access")
+    if resource_access and isinstance(resource_access, dict):
+        roles.update(
+            f"{_ROLE_PREFIX}{cr}"
+            for info in resource_access.values() if isinstance(info, dict)
+            for cr in info.get("roles", ())
+        )
     return roles
 
 def require_auth(func):
@@ -70,7 +242,7 @@ def require_auth(func):
         if not token:
             return jsonify({"msg": "Missing Authorization Bearer token"}), 401
         try:
-            claims = verify_jwt(token)
+            claims, roles = _verify_jwt_cached_entry(token)
         except ExpiredSignatureError:
             return jsonify({"msg": "Token expired"}), 401
         except InvalidTokenError as e:
@@ -79,25 +251,24 @@ def require_auth(func):
             return jsonify({"msg": "Token verification error", "error": str(e)}), 401
 
         g.jwt_claims = claims
-        g.roles = extract_roles_from_claims(claims)
+        g.roles = roles
         # helper username
         g.username = claims.get("preferred_username") or claims.get("sub")
         return func(*args, **kwargs)
     return wrapper
 
 def require_roles(*required_roles):
-    required = set()
-    for r in required_roles:
-        if r.startswith("ROLE_"):
-            required.add(r)
-        else:
-            required.add("ROLE_" + r)
+    required = frozenset(
+        r if r.startswith(_ROLE_PREFIX) else _ROLE_PREFIX + r
+        for r in required_roles
+    )
     def decorator(func):
         @wraps(func)
         @require_auth
         def wrapped(*args, **kwargs):
-            current = getattr(g, "roles", set())
-            if current & required:
+            current = getattr(g, "roles", frozenset())
+            # isdisjoint stops at the first shared role, without building an intersection
+            if not required.isdisjoint(current):
                 return func(*args, **kwargs)
             return jsonify({"msg": "Forbidden: missing role"}), 403
         return wrapped
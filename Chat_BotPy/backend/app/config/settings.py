@@ -1,54 +1,106 @@
-﻿import os
+﻿import logging
+import os
+from dataclasses import dataclass, field
 from dotenv import load_dotenv
 
-# Load .env once at startup
-load_dotenv()
+# Load .env once at startup (containers that inject env vars can set SKIP_DOTENV=1)
+if os.getenv("SKIP_DOTENV") != "1":
+    load_dotenv()
 
 
+def _env(name, default=""):
+    return field(default_factory=lambda: os.getenv(name, default))
+
+
+def _env_int(name, default):
+    return field(default_factory=lambda: int(os.getenv(name, default)))
+
+
+def _env_float(name, default):
+    return field(default_factory=lambda: float(os.getenv(name, default)))
+
+
+@dataclass(frozen=True, slots=True)
 class Settings:
-    def __init__(self):
-        # Application
-        self.APP_NAME = os.getenv("APP_NAME", "ChatBot_AI")
-        self.APP_VERSION = os.getenv("APP_VERSION", "1.0.0")
-        self.DEBUG = os.getenv("DEBUG", "false").lower() == "true"
-        # Server
-        self.HOST = os.getenv("HOST", "0.0.0.0")
-        self.PORT = int(os.getenv("PORT", 5001))
-        # Database
-        self.MONGODB_URI = os.getenv("MONGODB_URI", "")
-        # AI Provider
-        self.AI_PROVIDER = os.getenv("AI_PROVIDER", "")
-        # OpenAI
-        self.OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
-        self.OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")
-        self.OPENAI_MODEL = os.getenv("OPENAI_MODEL", "")
-        # API Settings
-        self.REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", 30))
-        # Scoring weights
-        self.GRAMMAR_WEIGHT = float(os.getenv("GRAMMAR_WEIGHT", 0.3))
-        self.VOCABULARY_WEIGHT = float(os.getenv("VOCABULARY_WEIGHT", 0.3))
-        self.FLUENCY_WEIGHT = float(os.getenv("FLUENCY_WEIGHT", 0.2))
-        self.NATURALNESS_WEIGHT = float(os.getenv("NATURALNESS_WEIGHT", 0.2))
-        # CORS
-        self.CORS_ORIGIN = [
-            os.getenv("CORS_ORIGIN", "http://localhost:3000")
-        ]
-        # Keycloak
-        self.KEYCLOAK_ISSUER_URI = os.getenv("KEYCLOAK_ISSUER_URI", "").rstrip("/")
-        self.KEYCLOAK_CLIENT_ID = os.getenv("KEYCLOAK_CLIENT_ID", "")
-        self.JWKS_URL = (
+    # Application
+    APP_NAME: str = _env("APP_NAME", "ChatBot_AI")
+    APP_VERSION: str = _env("APP_VERSION", "1.0.0")
+    DEBUG: bool = field(default_factory=lambda: os.getenv("DEBUG", "false").lower() == "true")
+    # Server
+    HOST: str = _env("HOST", "0.0.0.0")
+    PORT: int = _env_int("PORT", 5001)
+    # Database
+    MONGODB_URI: str = _env("MONGODB_URI")
+    # Connection pool của MongoClient (dùng chung cho mọi request trong một worker)
+    MONGO_MAX_POOL_SIZE: int = _env_int("MONGO_MAX_POOL_SIZE", 200)
+    MONGO_MIN_POOL_SIZE: int = _env_int("MONGO_MIN_POOL_SIZE", 10)
+    MONGO_MAX_IDLE_TIME_MS: int = _env_int("MONGO_MAX_IDLE_TIME_MS", 300000)
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = _env_int("MONGO_WAIT_QUEUE_TIMEOUT_MS", 2000)
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = _env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 3000)
+    MONGO_RETRY_WRITES: bool = field(
+        default_factory=lambda: os.getenv("MONGO_RETRY_WRITES", "true").lower() == "true"
+    )
+    # AI Provider
+    AI_PROVIDER: str = _env("AI_PROVIDER")
+    # OpenAI
+    OPENAI_API_KEY: str = field(default_factory=lambda: os.getenv("OPENAI_API_KEY", ""), repr=False)
+    OPENAI_BASE_URL: str = _env("OPENAI_BASE_URL")
+    OPENAI_MODEL: str = _env("OPENAI_MODEL")
+    # API Settings
+    REQUEST_TIMEOUT: int = _env_int("REQUEST_TIMEOUT", 30)
+    # Số lời gọi AI chạy đồng thời tối đa, tính RIÊNG cho mỗi process (mỗi gunicorn worker):
+    # toàn hệ thống là giá trị này x GUNICORN_WORKERS. Mặc định một nửa số thread của
+    # worker để luôn còn thread cho các request đọc; thời gian chờ (giây) khi hết slot chung
+    AI_PROCESS_MAX_CONCURRENCY: int = _env_int(
+        "AI_PROCESS_MAX_CONCURRENCY", max(1, int(os.getenv("GUNICORN_THREADS", 8)) // 2)
+    )
+    # Tương tự, giới hạn theo user trong một process (user có thể có thêm lời gọi ở worker khác)
+    AI_PROCESS_MAX_CONCURRENCY_PER_USER: int = _env_int("AI_PROCESS_MAX_CONCURRENCY_PER_USER", 1)
+    AI_SLOT_TIMEOUT: float = _env_float("AI_SLOT_TIMEOUT", 5.0)
+    # Scoring weights
+    GRAMMAR_WEIGHT: float = _env_float("GRAMMAR_WEIGHT", 0.3)
+    VOCABULARY_WEIGHT: float = _env_float("VOCABULARY_WEIGHT", 0.3)
+    FLUENCY_WEIGHT: float = _env_float("FLUENCY_WEIGHT", 0.2)
+    NATURALNESS_WEIGHT: float = _env_float("NATURALNESS_WEIGHT", 0.2)
+    # CORS
+    CORS_ORIGIN: list = field(default_factory=lambda: [
+        os.getenv("CORS_ORIGIN", "http://localhost:3000")
+    ])
+    # Keycloak
+    KEYCLOAK_ISSUER_URI: str = field(
+        default_factory=lambda: os.getenv("KEYCLOAK_ISSUER_URI", "").rstrip("/")
+    )
+    KEYCLOAK_CLIENT_ID: str = _env("KEYCLOAK_CLIENT_ID")
+    JWKS_URL: str | None = field(init=False, default=None)
+    # Cache claims của token đã verify (giây / số entry tối đa)
+    JWT_CACHE_TTL: int = _env_int("JWT_CACHE_TTL", 30)
+    JWT_CACHE_MAXSIZE: int = _env_int("JWT_CACHE_MAXSIZE", 10000)
+    # Thời gian giữ JWKS đã tải (giây), nên khớp chu kỳ xoay khóa của Keycloak
+    JWKS_CACHE_LIFESPAN: int = _env_int("JWKS_CACHE_LIFESPAN", 3600)
+    # External services
+    COURSE_SERVICE_BASE_URL: str = field(default_factory=lambda: os.getenv(
+        "COURSE_SERVICE_BASE_URL",
+        "http://localhost:9002/course-service",
+    ).rstrip("/"))
+    COURSE_SERVICE_TIMEOUT: int = _env_int("COURSE_SERVICE_TIMEOUT", 5)
+    # Cache kết quả gợi ý khóa học từ course-service (giây / số entry tối đa)
+    COURSE_CACHE_TTL: int = _env_int("COURSE_CACHE_TTL", 60)
+    COURSE_CACHE_MAXSIZE: int = _env_int("COURSE_CACHE_MAXSIZE", 64)
+    # Thời gian client được dùng lại response GET mà không cần hỏi lại server (giây)
+    HTTP_CACHE_MAX_AGE: int = _env_int("HTTP_CACHE_MAX_AGE", 10)
+
+    def __post_init__(self):
+        # JWKS_URL suy ra từ issuer nên tính sau khi các field khác đã có giá trị
+        object.__setattr__(
+            self,
+            "JWKS_URL",
             f"{self.KEYCLOAK_ISSUER_URI}/protocol/openid-connect/certs"
             if self.KEYCLOAK_ISSUER_URI
-            else None
+            else None,
         )
-        # External services
-        self.COURSE_SERVICE_BASE_URL = os.getenv(
-            "COURSE_SERVICE_BASE_URL",
-            "http://localhost:9002/course-service",
-        ).rstrip("/")
-        self.COURSE_SERVICE_TIMEOUT = int(os.getenv("COURSE_SERVICE_TIMEOUT", 5))
 
 
 settings = Settings()
-print(f"[config] COURSE_SERVICE_BASE_URL={settings.COURSE_SERVICE_BASE_URL}")
-print(f"[config] COURSE_SERVICE_TIMEOUT={settings.COURSE_SERVICE_TIMEOUT}s")
\ No newline at end of file
+logger = logging.getLogger(__name__)
+logger.debug("[config] COURSE_SERVICE_BASE_URL=%s", settings.COURSE_SERVICE_BASE_URL)
+logger.debug("[config] COURSE_SERVICE_TIMEOUT=%ss", settings.COURSE_SERVICE_TIMEOUT)
@@ -1,10 +1,12 @@
 """
 AI Controller - Handles AI-specific endpoints matching BRD/SRS spec
 """
-from typing import Dict, Any, Optional
-from datetime import datetime
+from functools import lru_cache
+from itertools import chain
+from operator import attrgetter
+from typing import Dict, Any, Optional, Tuple
 
-from app.models.conversation import Conversation, Message, MessageAnalysis
+from app.models.conversation import Conversation, MessageAnalysis
 from app.models.conversation_analysis import ConversationAnalysis, AnalysisScores, AnalysisErrors
 from app.models.enums import ConversationMode, JLPTLevel
 from app.repositories.conversation_repository import ConversationRepository
@@ -31,6 +33,44 @@ except ImportError:
         def analyze(sentence, level=None):
             return {'score': 7.0, 'level_appropriate': True, 'suggestions': []}
 from app.services.scoring_service import ScoringService
+from app.utils.request_cache import request_cached
+
+
+_CONTENT = attrgetter('content')
+
+
+# Analyzers are pure functions of (content, level); memoize them so
+# re-evaluating a conversation does not re-analyze unchanged messages.
+# All analyzers run behind one cache entry per message, and only the fields
+# evaluate() reads are kept, as immutable values:
+# (grammar score, vocabulary score, grammar errors, particle errors)
+def _run_analyzers(
+    content: str, level: Optional[str]
+) -> Tuple[Any, Any, Tuple[str, ...], Tuple[str, ...]]:
+    grammar = GrammarAnalyzer.analyze(content, level)
+    vocabulary = VocabularyAnalyzer.analyze(content, level)
+    particles = ParticleAnalyzer.analyze(content)
+    return (
+        grammar.get('score', 0),
+        vocabulary.get('score', 0),
+        tuple(grammar.get('errors', [])),
+        tuple(particles.get('particle_errors', [])),
+    )
+
+
+_cached_analyzers = lru_cache(maxsize=4096)(_run_analyzers)
+
+# Repeats are short utterances (greetings, stock replies); long messages
+# rarely recur, so they bypass the cache instead of evicting those entries
+_MAX_CACHED_CONTENT_LEN = 512
+
+
+def _analyze_message(
+    content: str, level: Optional[str]
+) -> Tuple[Any, Any, Tuple[str, ...], Tuple[str, ...]]:
+    if len(content) > _MAX_CACHED_CONTENT_LEN:
+        return _run_analyzers(content, level)
+    return _cached_analyzers(content, level)
 
 
 class AIController:
@@ -48,6 +88,14 @@ class AIController:
         self.ai_service = ai_service
         self.scoring_service = scoring_service
 
+    def _get_conversation(self, conversation_id: str) -> Optional[Conversation]:
+        """Load a conversation at most once per request"""
+        return request_cached(
+            '_conversation_cache',
+            conversation_id,
+            lambda: self.conversation_repo.find_by_id(conversation_id),
+        )
+
     def chat(
         self,
         conversation_id: str,
@@ -72,16 +120,15 @@ class AIController:
         Returns:
             Dict with reply and conversation_id
         """
-        conversation = self.conversation_repo.find_by_id(conversation_id)
+        conversation = self._get_conversation(conversation_id)
         if not conversation:
             raise ValueError(f"Conversation {conversation_id} not found")
         if conversation.language != "ja":
             raise ValueError("Language not supported yet")
 
         # Do not persist new messages here (ai_routes is read-only for conversations)
-        temp_messages = list(conversation.messages)
-        temp_messages.append(Message(role='user', content=message, timestamp=datetime.utcnow()))
-        chat_history = [{'role': m.role, 'content': m.content} for m in temp_messages]
+        chat_history = [{'role': m.role, 'content': m.content} for m in conversation.messages]
+        chat_history.append({'role': 'user', 'content': message})
 
         # Get AI response
         ai_response = self.ai_service.chat(
@@ -110,7 +157,7 @@ class AIController:
         Returns:
             Dict with jlpt_estimation, scores, errors
         """
-        conversation = self.conversation_repo.find_by_id(conversation_id)
+        conversation = self._get_conversation(conversation_id)
         if not conversation:
             raise ValueError(f"Conversation {conversation_id} not found")
         if conversation.language != "ja":
@@ -125,28 +172,28 @@ class AIController:
         # Analyze all user messages
         grammar_errors = []
         particle_errors = []
-        all_text = ' '.join([msg.content for msg in user_messages])
+        all_text = ' '.join(map(_CONTENT, user_messages))
 
         # JLPT estimation
-        jlpt_estimation_result = JLPTLevelEstimator.estimate(all_text, jlpt_target)
-        jlpt_estimation = jlpt_estimation_result['estimated_level']
+        jlpt_estimation = JLPTLevelEstimator.estimate_level(all_text)
 
         # Enrich messages with analysis for scoring
+        level = conversation.level
         for msg in user_messages:
-            grammar_result = GrammarAnalyzer.analyze(msg.content, conversation.level)
-            vocab_result = VocabularyAnalyzer.analyze(msg.content, conversation.level)
-            particle_result = ParticleAnalyzer.analyze(msg.content)
+            grammar_score, vocab_score, msg_grammar_errors, msg_particle_errors = (
+                _analyze_message(msg.content, level)
+            )
 
-            grammar_errors.extend(grammar_result.get('errors', []))
-            particle_errors.extend(particle_result.get('particle_errors', []))
+            grammar_errors.extend(msg_grammar_errors)
+            particle_errors.extend(msg_particle_errors)
 
             msg.analysis = MessageAnalysis(
-                grammar={'score': grammar_result.get('score', 0)},
-                vocabulary={'score': vocab_result.get('score', 0)},
-                naturalness={'score': grammar_result.get('score', 0)},
+                grammar={'score': grammar_score},
+                vocabulary={'score': vocab_score},
+                naturalness={'score': grammar_score},
                 response_time=None,
-                grammar_errors=grammar_result.get('errors', []),
-                particle_errors=particle_result.get('particle_errors', []),
+                grammar_errors=list(msg_grammar_errors),
+                particle_errors=list(msg_particle_errors),
                 keigo_score=None,
                 jlpt_estimation=jlpt_estimation,
             )
@@ -164,10 +211,10 @@ class AIController:
                 naturalness=float(overall_score.naturalness)
             ),
             errors=AnalysisErrors(
-                grammar=list(set(grammar_errors)),  # Remove duplicates
-                particles=list(set(particle_errors))
+                grammar=list(dict.fromkeys(grammar_errors)),  # Remove duplicates, keep order
+                particles=list(dict.fromkeys(particle_errors))
             ),
-            common_mistakes=list(set(grammar_errors + particle_errors))
+            common_mistakes=list(dict.fromkeys(chain(grammar_errors, particle_errors)))
         )
 
         # Persist analysis and cache score on conversation
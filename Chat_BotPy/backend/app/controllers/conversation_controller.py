@@ -3,14 +3,121 @@ Conversation Controller
 Chỉ quản lý luồng điều khiển (flow) và tương tác giữa các service, repository
 Logic nghiệp vụ được tách ra service riêng biệt
 """
+import hashlib
+import logging
+import threading
+import weakref
+from contextlib import contextmanager
+from itertools import chain
 from typing import Optional
 from datetime import datetime
-from app.models.conversation import Conversation, Message
+from app.models.conversation import Conversation, ConversationSummary, Message
 from app.repositories.conversation_repository import ConversationRepository
 from app.services.ai.base_ai_service import IAIService
 from flask import request
 from app.config import settings
+from app.utils.request_cache import request_cached
+from cachetools import TTLCache
+from werkzeug.exceptions import TooManyRequests
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# Bảng ánh xạ JLPT -> categoryId của course-service
+_JLPT_TO_CATEGORY = {
+    "N1": 1,
+    "N2": 2,
+    "N3": 3,
+    "N4": 4,
+    "N5": 5,
+}
+
+# Bảng ánh xạ conversation_mode -> tagId của course-service
+_MODE_TO_TAG = {
+    "speaking_practice": 1,
+    "listening_practice": 4,
+    "grammar_practice": 2,
+    "vocabulary_practice": 3,
+}
+
+# Nhãn hiển thị của từng tagId
+_TAG_LABELS = {
+    1: "Giao tiếp",
+    2: "Ngữ pháp",
+    3: "Từ vựng",
+    4: "Luyện nghe",
+}
+
+
+# Giới hạn lời gọi AI đang chạy trong process này (mỗi gunicorn worker có bộ đếm riêng):
+# chung cho cả process (bảo vệ provider và thread pool của worker) và theo từng user
+# (một user gửi dồn dập không chiếm hết slot chung)
+_ai_slots = threading.BoundedSemaphore(settings.AI_PROCESS_MAX_CONCURRENCY)
+# Semaphore của user chỉ sống khi còn request của user đó đang giữ nó
+_user_ai_slots: "weakref.WeakValueDictionary[str, threading.BoundedSemaphore]" = weakref.WeakValueDictionary()
+_user_ai_slots_lock = threading.Lock()
+
+
+def _user_ai_slot(user_id: str) -> threading.BoundedSemaphore:
+    with _user_ai_slots_lock:
+        slot = _user_ai_slots.get(user_id)
+        if slot is None:
+            slot = _user_ai_slots[user_id] = threading.BoundedSemaphore(
+                settings.AI_PROCESS_MAX_CONCURRENCY_PER_USER
+            )
+        return slot
+
+
+@contextmanager
+def _ai_call_slot(user_id: str):
+    """
+    Giữ một slot của user và một slot chung trong lúc gọi AI
+    User đã dùng hết slot thì bị từ chối ngay (không giữ thread của worker chờ),
+    còn slot chung thì chờ tối đa AI_SLOT_TIMEOUT giây
+
+    Raises:
+        TooManyRequests (429) khi không lấy được slot
+    """
+    user_slot = _user_ai_slot(user_id)
+    if not user_slot.acquire(blocking=False):
+        raise TooManyRequests("Too many messages in progress, please wait for the previous reply")
+    try:
+        if not _ai_slots.acquire(timeout=settings.AI_SLOT_TIMEOUT):
+            raise TooManyRequests("AI service is busy, please try again")
+        try:
+            yield
+        finally:
+            _ai_slots.release()
+    finally:
+        user_slot.release()
+
+
+def _build_course_session() -> requests.Session:
+    """
+    Tạo Session dùng chung cho các lần gọi course-service,
+    tái sử dụng kết nối TCP/TLS qua connection pool của urllib3
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=50,
+        max_retries=Retry(total=3, backoff_factor=0.1, status_forcelist=[502, 503, 504]),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Session (connection pool tới course-service) dùng chung cho cả process, tạo một lần khi import
+_course_session = _build_course_session()
+
+# Danh mục khóa học hiếm khi đổi giữa các request: cache kết quả đã map theo
+# (url, categoryId, tagId, sha256(Authorization)), không giữ token gốc làm key
+_course_cache = TTLCache(maxsize=settings.COURSE_CACHE_MAXSIZE, ttl=settings.COURSE_CACHE_TTL)
+_course_cache_lock = threading.Lock()
 
 
 class ConversationController:
@@ -29,6 +136,17 @@ class ConversationController:
         self.conversation_repo = conversation_repo
         self.ai_service = ai_service
         self.course_service_base_url = course_service_base_url.rstrip('/')
+        self._http = _course_session
+
+    def _get_conversation(self, conversation_id: str) -> Optional[Conversation]:
+        """
+        Lấy conversation theo id, mỗi request chỉ truy vấn DB một lần
+        """
+        return request_cached(
+            '_conversation_cache',
+            conversation_id,
+            lambda: self.conversation_repo.find_by_id(conversation_id),
+        )
 
     def create_conversation(
             self,
@@ -78,7 +196,7 @@ class ConversationController:
             ValueError nếu không tìm thấy conversation
         """
         # Lấy conversation từ DB
-        conversation = self.conversation_repo.find_by_id(conversation_id)
+        conversation = self._get_conversation(conversation_id)
         if not conversation:
             raise ValueError(f"Conversation {conversation_id} not found")
         if conversation.language != "ja":
@@ -92,28 +210,36 @@ class ConversationController:
             analysis=None,
         )
 
-        # Thêm message user vào conversation
-        conversation.add_message(user_message)
-
-        # Lấy lịch sử chat dưới dạng list dict (role, content) cho AI service
-        chat_history = conversation.get_chat_history()
-        ai_response = self.ai_service.chat(
-            chat_history,
-            conversation.topic,
-            conversation.level
-        )
+        # Truyền lịch sử chat (role, content) dạng generator kèm message user mới,
+        # AI service chỉ duyệt một lần; số lời gọi AI đồng thời bị giới hạn
+        with _ai_call_slot(conversation.user_id):
+            ai_response = self.ai_service.chat(
+                chain(
+                    conversation.iter_chat_history(),
+                    ({'role': user_message.role, 'content': user_message.content},),
+                ),
+                conversation.topic,
+                conversation.level
+            )
 
-        # Tạo Message AI
+        # Tạo Message AI; thời điểm nhận phản hồi cũng là updated_at của conversation.
+        # Message user giữ timestamp riêng (trước lời gọi AI) để không làm lệch thứ tự.
+        replied_at = datetime.utcnow()
         ai_message = Message(
             role='assistant',
             content=ai_response,
-            timestamp=datetime.utcnow()
+            timestamp=replied_at
         )
-        # Thêm message AI vào conversation
-        conversation.add_message(ai_message)
+        # Thêm message user và AI vào conversation cùng lúc (update timestamp một lần)
+        conversation.extend_messages((user_message, ai_message), now=replied_at)
 
-        # Lưu conversation đã cập nhật
-        self.conversation_repo.update(conversation_id, conversation)
+        # Chỉ ghi thêm 2 message mới và điểm/updated_at, không ghi lại cả lịch sử
+        self.conversation_repo.append_messages(
+            conversation_id,
+            (user_message, ai_message),
+            overall_score=conversation.overall_score,
+            updated_at=conversation.updated_at,
+        )
 
         # Trả dữ liệu cho API response
         return {
@@ -126,7 +252,7 @@ class ConversationController:
         """
         Lấy conversation theo id
         """
-        return self.conversation_repo.find_by_id(conversation_id)
+        return self._get_conversation(conversation_id)
 
     def get_user_conversations(
             self,
@@ -139,6 +265,17 @@ class ConversationController:
         """
         return self.conversation_repo.find_by_user_id(user_id, skip, limit)
 
+    def get_user_conversation_summaries(
+            self,
+            user_id: str,
+            skip: int = 0,
+            limit: int = 20
+    ) -> list[ConversationSummary]:
+        """
+        Lấy danh sách hội thoại rút gọn (không kèm messages) của một user, có phân trang
+        """
+        return self.conversation_repo.find_summaries_by_user_id(user_id, skip, limit)
+
     def get_user_statistics(self, user_id: str) -> dict:
         """
         Lấy thống kê các cuộc hội thoại của người dùng
@@ -152,36 +289,17 @@ class ConversationController:
         return self.conversation_repo.get_user_statistics(user_id)
 
     def _map_jlpt_to_category(self, jlpt_target: str) -> Optional[int]:
-        mapping = {
-            "N1": 1,
-            "N2": 2,
-            "N3": 3,
-            "N4": 4,
-            "N5": 5,
-        }
-        return mapping.get(jlpt_target)
+        return _JLPT_TO_CATEGORY.get(jlpt_target)
 
     def _map_mode_to_tag(self, mode: str) -> Optional[int]:
-        mapping = {
-            "speaking_practice": 1,
-            "listening_practice": 4,
-            "grammar_practice": 2,
-            "vocabulary_practice": 3,
-        }
-        return mapping.get(mode, 1)
+        return _MODE_TO_TAG.get(mode, 1)
 
     @staticmethod
     def _tag_label(tag_id: Optional[int]) -> Optional[str]:
-        labels = {
-            1: "Giao tiếp",
-            2: "Ngữ pháp",
-            3: "Từ vựng",
-            4: "Luyện nghe",
-        }
-        return labels.get(tag_id) if tag_id else None
+        return _TAG_LABELS.get(tag_id) if tag_id else None
 
     def get_recommendations(self, conversation_id: str, auth_header: Optional[str] = None) -> list:
-        conversation = self.conversation_repo.find_by_id(conversation_id)
+        conversation = self._get_conversation(conversation_id)
         if not conversation:
             raise ValueError(f"Conversation {conversation_id} not found")
 
@@ -203,36 +321,54 @@ class ConversationController:
             headers["Authorization"] = auth_header
 
         url = f"{self.course_service_base_url.rstrip('/')}/storefront/courses"
-        print(f"[course-service] Using base URL: {self.course_service_base_url}")
+        cache_key = (
+            url,
+            category_id,
+            tag_id,
+            hashlib.sha256(auth_header.encode()).digest() if auth_header else None,
+        )
+        with _course_cache_lock:
+            cached = _course_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+
+        logger.debug("[course-service] Using base URL: %s", self.course_service_base_url)
         try:
-            resp = requests.get(
+            resp = self._http.get(
                 url,
                 params=params,
                 headers=headers,
                 timeout=settings.COURSE_SERVICE_TIMEOUT,
             )
-            print(f"[course-service] Request URL: {resp.url}")
-            print(f"[course-service] Status code: {resp.status_code}")
+            logger.debug("[course-service] Request URL: %s", resp.url)
+            logger.debug("[course-service] Status code: %s", resp.status_code)
             resp.raise_for_status()
-            payload = resp.json()
-            print(f"[course-service] Response body: {payload}")
+            payload = orjson.loads(resp.content)
+            logger.debug("[course-service] Response body: %s", payload)
         except Exception as e:
-            print(f"[course-service] error: {e}")
+            logger.warning("[course-service] error: %s", e)
             return []
 
         courses = payload if isinstance(payload, list) else payload.get("content") or payload.get("data") or []
 
+        # Nhãn tag không đổi khi đã lọc theo tag_id nên tính một lần ngoài vòng lặp
+        tag_label = self._tag_label(tag_id) if tag_id else None
         results = []
+        append = results.append
         for c in courses:
-            c_tag = c.get("tagId") or c.get("tag_id")
+            get = c.get
+            c_tag = get("tagId") or get("tag_id")
             if tag_id and c_tag and c_tag != tag_id:
                 continue
-            results.append({
-                "course_id": c.get("id") or c.get("courseId") or c.get("course_id"),
-                "title": c.get("title") or c.get("courseTitle") or c.get("name"),
-                "price": c.get("price"),
-                "level": c.get("level"),
-                "image_url": c.get("imagePresignedUrl") or c.get("image_url") or c.get("imageUrl"),
-                "tag": self._tag_label(tag_id) if tag_id else self._tag_label(c_tag),
+            append({
+                "course_id": get("id") or get("courseId") or get("course_id"),
+                "title": get("title") or get("courseTitle") or get("name"),
+                "price": get("price"),
+                "level": get("level"),
+                "image_url": get("imagePresignedUrl") or get("image_url") or get("imageUrl"),
+                "tag": tag_label if tag_id else self._tag_label(c_tag),
             })
-        return results
+        # Chỉ cache khi gọi course-service thành công (lỗi đã return [] ở trên)
+        with _course_cache_lock:
+            _course_cache[cache_key] = results
+        return list(results)
@@ -6,13 +6,21 @@ from bson import ObjectId      # kiểu ObjectId đặc biệt dùng trong Mongo
 class BaseModel:
     """Base model với các trường chung và phương thức cơ bản"""
 
+    # khai báo __slots__ để object không cần __dict__ riêng (nhẹ bộ nhớ, truy cập thuộc tính nhanh hơn)
+    __slots__ = ('_id', 'created_at', 'updated_at', '_created_iso', '_updated_iso')
+
     def __init__(self):
         # _id là trường lưu ID (ObjectId) của document trong MongoDB
         self._id: Optional[ObjectId] = None
+        # chỉ gọi utcnow() một lần, created_at và updated_at dùng chung giá trị này
+        now = datetime.utcnow()
         # created_at lưu thời điểm tạo object (theo chuẩn UTC hiện tại)
-        self.created_at: datetime = datetime.utcnow()
+        self.created_at: datetime = now
         # updated_at lưu thời điểm cập nhật cuối cùng (mặc định lúc tạo cũng là thời điểm hiện tại)
-        self.updated_at: datetime = datetime.utcnow()
+        self.updated_at: datetime = now
+        # cache chuỗi ISO đã format dạng (datetime, chuỗi ISO) để to_dict không phải format lại
+        self._created_iso: Optional[tuple] = None
+        self._updated_iso: Optional[tuple] = None
 
     def to_dict(self) -> dict:
         """
@@ -23,12 +31,37 @@ class BaseModel:
             # chuyển _id thành chuỗi, nếu _id chưa có thì None
             'id': str(self._id) if self._id else None,
             # created_at chuyển thành chuỗi ISO8601, nếu không có thì None
-            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'created_at': self._created_at_iso(),
             # tương tự với updated_at
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'updated_at': self._updated_at_iso()
         }
         return data
 
+    def to_document(self) -> dict:
+        """
+        Dict dùng để lưu xuống MongoDB
+        Mặc định giống to_dict(), lớp con override khi muốn lưu kiểu BSON gốc (ví dụ datetime)
+        """
+        return self.to_dict()
+
+    def _created_at_iso(self) -> Optional[str]:
+        """Chuỗi ISO của created_at, chỉ format lại khi created_at được gán giá trị khác"""
+        if not self.created_at:
+            return None
+        cached = self._created_iso
+        if cached is None or cached[0] is not self.created_at:
+            cached = self._created_iso = (self.created_at, self.created_at.isoformat())
+        return cached[1]
+
+    def _updated_at_iso(self) -> Optional[str]:
+        """Chuỗi ISO của updated_at, chỉ format lại khi updated_at được gán giá trị khác"""
+        if not self.updated_at:
+            return None
+        cached = self._updated_iso
+        if cached is None or cached[0] is not self.updated_at:
+            cached = self._updated_iso = (self.updated_at, self.updated_at.isoformat())
+        return cached[1]
+
     @classmethod
     def from_dict(cls, data: dict):
         """
@@ -47,9 +80,10 @@ class BaseModel:
             instance.updated_at = data['updated_at']
         return instance
 
-    def update_timestamp(self):
-        """Cập nhật lại thời gian updated_at thành thời gian hiện tại"""
-        self.updated_at = datetime.utcnow()
+    def update_timestamp(self, now: Optional[datetime] = None):
+        """Cập nhật lại thời gian updated_at thành thời gian hiện tại (hoặc now nếu đã có sẵn)"""
+        self.updated_at = now or datetime.utcnow()
+        self._updated_iso = None  # bỏ chuỗi ISO cũ đã cache
 
 
 class Entity(BaseModel):
@@ -58,6 +92,8 @@ class Entity(BaseModel):
     Áp dụng pattern Entity: đối tượng có định danh (identity)
     """
 
+    __slots__ = ()
+
     def __eq__(self, other) -> bool:
         """
         Định nghĩa phép so sánh bằng (==) giữa hai entity
@@ -2,14 +2,24 @@
 
 from dataclasses import dataclass  # Dùng để tạo class dạng data container tự sinh __init__, __repr__...
 from datetime import datetime  # Xử lý thời gian
-from typing import List, Optional, Dict, Any  # Định kiểu cho biến, hàm
+from typing import Iterable, Iterator, List, Optional, Dict, Any  # Định kiểu cho biến, hàm
 from bson import ObjectId  # Lớp ObjectId đặc biệt dùng cho ID trong MongoDB
 
 from .base import BaseModel, Entity  # Import lớp cơ sở (Entity có thể chứa các thuộc tính như _id, created_at,...)
 from .enums import ConversationMode  # Import enum cho conversation mode
 
+# Giá trị mặc định của conversation_mode, resolve enum một lần khi import module
+_DEFAULT_MODE = ConversationMode.SPEAKING_PRACTICE.value
+# Bind sẵn datetime.utcnow để các nhánh fallback khi tạo/đọc Message chỉ tốn một lần load
+_utcnow = datetime.utcnow
 
-@dataclass
+
+def _iz(value: Any) -> int:
+    # Ép kiểu int, None/0/'' thành 0 (giống int(value or 0) nhưng chỉ kiểm tra truthy một lần)
+    return int(value) if value else 0
+
+
+@dataclass(slots=True)
 class MessageAnalysis:
     # Lớp này lưu trữ kết quả phân tích chi tiết cho một tin nhắn (như điểm ngữ pháp, từ vựng, tự nhiên...)
     grammar: Dict[str, Any]  # Dữ liệu phân tích về ngữ pháp, kiểu dict vì có thể có nhiều chỉ số khác nhau
@@ -47,19 +57,20 @@ class MessageAnalysis:
         if not data:
             # Nếu data là None hoặc rỗng thì trả về None luôn
             return None
+        get = data.get  # Bind data.get một lần thay vì tra cứu lại cho từng field
         return MessageAnalysis(
-            grammar=data.get('grammar', {}),  # Lấy trường 'grammar' hoặc dict rỗng nếu không có
-            vocabulary=data.get('vocabulary', {}),  # Tương tự với 'vocabulary'
-            naturalness=data.get('naturalness', {}),  # Và 'naturalness'
-            response_time=data.get('response_time'),  # Lấy response_time, có thể None
-            grammar_errors=data.get('grammar_errors', []) or [],  # Lỗi ngữ pháp
-            particle_errors=data.get('particle_errors', []) or [],  # Lỗi trợ từ
-            keigo_score=data.get('keigo_score'),  # Điểm kính ngữ
-            jlpt_estimation=data.get('jlpt_estimation'),  # Ước lượng JLPT
+            grammar=get('grammar', {}),  # Lấy trường 'grammar' hoặc dict rỗng nếu không có
+            vocabulary=get('vocabulary', {}),  # Tương tự với 'vocabulary'
+            naturalness=get('naturalness', {}),  # Và 'naturalness'
+            response_time=get('response_time'),  # Lấy response_time, có thể None
+            grammar_errors=get('grammar_errors') or [],  # Lỗi ngữ pháp
+            particle_errors=get('particle_errors') or [],  # Lỗi trợ từ
+            keigo_score=get('keigo_score'),  # Điểm kính ngữ
+            jlpt_estimation=get('jlpt_estimation'),  # Ước lượng JLPT
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class Score:
     # Lớp lưu điểm tổng quan từng mảng về kỹ năng của người học
     grammar: int = 0  # Điểm ngữ pháp (mặc định 0)
@@ -84,16 +95,17 @@ class Score:
         if not data:
             # Nếu không có dữ liệu, trả về điểm mặc định (0 tất cả)
             return Score()
+        get = data.get
         return Score(
-            grammar=int(data.get('grammar', 0) or 0),  # Lấy điểm grammar, ép kiểu int, nếu None hoặc False thì thành 0
-            vocabulary=int(data.get('vocabulary', 0) or 0),
-            fluency=int(data.get('fluency', 0) or 0),
-            naturalness=int(data.get('naturalness', 0) or 0),
-            total=int(data.get('total', 0) or 0),
+            grammar=_iz(get('grammar')),  # Lấy điểm grammar, ép kiểu int, nếu None hoặc False thì thành 0
+            vocabulary=_iz(get('vocabulary')),
+            fluency=_iz(get('fluency')),
+            naturalness=_iz(get('naturalness')),
+            total=_iz(get('total')),
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class Recommendation:
     # Lớp lưu trữ đề xuất khóa học dựa trên kết quả hoặc lịch sử học tập
     type: str  # Loại đề xuất (ví dụ: 'course', 'practice', ...)
@@ -118,8 +130,81 @@ class Recommendation:
         )
 
 
+@dataclass(slots=True)
+class ConversationSummary:
+    # Bản rút gọn của Conversation cho màn hình danh sách: không có messages/recommendations
+    id: Optional[str]
+    user_id: str
+    topic: str
+    level: str
+    conversation_mode: Optional[str] = None
+    jlpt_target: Optional[str] = None
+    jlpt_estimation: Optional[str] = None
+    overall_score: Optional[Score] = None
+    created_at: Any = None  # datetime hoặc chuỗi ISO tuỳ dữ liệu đã lưu
+    updated_at: Any = None
+
+    # Các field cần lấy từ MongoDB (dùng làm projection)
+    FIELDS = (
+        'user_id', 'topic', 'level', 'conversation_mode', 'jlpt_target',
+        'jlpt_estimation', 'overall_score', 'created_at', 'updated_at',
+    )
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'topic': self.topic,
+            'level': self.level,
+            'conversation_mode': self.conversation_mode,
+            'jlpt_target': self.jlpt_target,
+            'jlpt_estimation': self.jlpt_estimation,
+            'overall_score': self.overall_score.to_dict() if self.overall_score else None,
+            'created_at': _iso_or_value(self.created_at),
+            'updated_at': _iso_or_value(self.updated_at),
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> ConversationSummary:
+        get = data.get
+        _id = get('_id')
+        level = get('level', '')
+        return ConversationSummary(
+            id=str(_id) if _id else None,
+            user_id=get('user_id', ''),
+            topic=get('topic', ''),
+            level=level,
+            conversation_mode=get('conversation_mode'),
+            jlpt_target=get('jlpt_target') or level,
+            jlpt_estimation=get('jlpt_estimation'),
+            overall_score=Score.from_dict(get('overall_score')),
+            created_at=get('created_at'),
+            updated_at=get('updated_at'),
+        )
+
+
+def _iso_or_value(value: Any) -> Any:
+    # datetime -> chuỗi ISO, còn lại (chuỗi ISO đã lưu hoặc None) giữ nguyên
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _to_datetime(value: Any) -> Optional[datetime]:
+    # Timestamp đã lưu có thể là BSON Date hoặc chuỗi ISO (BaseModel.to_dict); sai định dạng -> None
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return None
+
+
 class Message(Entity):
     # Lớp đại diện cho một tin nhắn trong cuộc trò chuyện (có vai trò user/assistant, nội dung,...)
+    # Một conversation có thể giữ hàng trăm Message nên dùng __slots__ thay cho __dict__
+    __slots__ = ('role', 'content', 'timestamp', 'analysis')
+
     def __init__(
         self,
         role: str,  # Ai gửi tin nhắn (ví dụ: 'user' hoặc 'assistant')
@@ -130,7 +215,7 @@ class Message(Entity):
         super().__init__()
         self.role = role
         self.content = content
-        self.timestamp: datetime = timestamp or datetime.utcnow()  # Gán thời gian hiện tại nếu không có timestamp
+        self.timestamp: datetime = timestamp or _utcnow()  # Gán thời gian hiện tại nếu không có timestamp
         self.analysis = analysis
 
     def to_dict(self) -> dict:
@@ -143,34 +228,51 @@ class Message(Entity):
             'analysis': self.analysis.to_dict() if self.analysis else None,
         }
 
+    def to_document(self) -> dict:
+        # Dict để lưu MongoDB: timestamp giữ nguyên datetime để lưu thành BSON Date,
+        # khi đọc lại from_dict không phải parse chuỗi ISO
+        return {
+            'role': self.role,
+            'content': self.content,
+            'timestamp': self.timestamp,
+            'analysis': self.analysis.to_dict() if self.analysis else None,
+        }
+
     @staticmethod
     def from_dict(data: dict) -> Message:
         # Tạo đối tượng Message từ dict (ví dụ khi lấy dữ liệu từ DB)
-        timestamp_value = data.get('timestamp')
-        if isinstance(timestamp_value, str):
+        get = data.get
+        timestamp_value = get('timestamp')
+        if isinstance(timestamp_value, datetime):
+            # Nếu timestamp đã là datetime (trường hợp thường gặp khi đọc từ MongoDB) thì dùng luôn
+            parsed_ts = timestamp_value
+        elif isinstance(timestamp_value, str):
+            # Dữ liệu cũ lưu timestamp dạng chuỗi ISO (xem ConversationRepository.migrate_message_timestamps)
             # Nếu timestamp là chuỗi, cố parse thành datetime
             try:
                 parsed_ts = datetime.fromisoformat(timestamp_value)
             except ValueError:
                 # Nếu parse lỗi thì lấy thời gian hiện tại thay thế
-                parsed_ts = datetime.utcnow()
-        elif isinstance(timestamp_value, datetime):
-            # Nếu timestamp đã là datetime thì dùng luôn
-            parsed_ts = timestamp_value
+                parsed_ts = _utcnow()
         else:
             # Nếu không có hoặc kiểu khác, lấy thời gian hiện tại
-            parsed_ts = datetime.utcnow()
+            parsed_ts = _utcnow()
 
         return Message(
-            role=data.get('role', ''),  # Lấy role hoặc chuỗi rỗng nếu không có
-            content=data.get('content', ''),  # Lấy nội dung tin nhắn hoặc chuỗi rỗng
+            role=get('role', ''),  # Lấy role hoặc chuỗi rỗng nếu không có
+            content=get('content', ''),  # Lấy nội dung tin nhắn hoặc chuỗi rỗng
             timestamp=parsed_ts,
-            analysis=MessageAnalysis.from_dict(data.get('analysis')),  # Phân tích tin nhắn (có thể None)
+            analysis=MessageAnalysis.from_dict(get('analysis')),  # Phân tích tin nhắn (có thể None)
         )
 
 
 class Conversation(Entity):
     # Lớp chính lưu trữ toàn bộ cuộc hội thoại của người dùng
+    __slots__ = (
+        'user_id', 'topic', 'level', 'messages', 'overall_score', 'recommendations',
+        'conversation_mode', 'language', 'jlpt_target', 'summary', 'jlpt_estimation',
+    )
+
     def __init__(
         self,
         user_id: str,  # ID người dùng
@@ -194,7 +296,7 @@ class Conversation(Entity):
         self.overall_score: Score = overall_score or Score()  # Nếu không có điểm thì tạo Score mặc định (0)
         self.recommendations: List[Recommendation] = recommendations or []  # Nếu không có thì danh sách rỗng
         # Enhanced fields
-        self.conversation_mode = conversation_mode or ConversationMode.SPEAKING_PRACTICE.value
+        self.conversation_mode = conversation_mode or _DEFAULT_MODE
         self.language = language
         self.jlpt_target = jlpt_target or level  # Default to level if not provided
         self.summary = summary
@@ -206,9 +308,19 @@ class Conversation(Entity):
         # Cập nhật thời gian cập nhật cuối (có thể để tracking sửa đổi)
         self.update_timestamp()
 
+    def extend_messages(self, messages: Iterable[Message], now: Optional[datetime] = None) -> None:
+        # Thêm nhiều tin nhắn cùng lúc, chỉ cập nhật updated_at một lần cho cả lô
+        # (now: thời điểm đã lấy sẵn của caller, tránh gọi utcnow() thêm lần nữa)
+        self.messages.extend(messages)
+        self.update_timestamp(now)
+
+    def iter_chat_history(self) -> Iterator[Dict[str, str]]:
+        # Sinh lần lượt từng dict role + content, không tạo list trung gian khi chỉ duyệt một lần (AI service)
+        return ({'role': m.role, 'content': m.content} for m in self.messages)
+
     def get_chat_history(self) -> List[Dict[str, str]]:
         # Trả về lịch sử trò chuyện dưới dạng list dict với mỗi dict có role + content (dùng cho frontend hoặc AI)
-        return [{'role': m.role, 'content': m.content} for m in self.messages]
+        return list(self.iter_chat_history())
 
     def update_score(self, score: Score) -> None:
         # Cập nhật điểm tổng thể cho cuộc hội thoại và update timestamp
@@ -220,15 +332,27 @@ class Conversation(Entity):
         self.recommendations.extend(recs)
         self.update_timestamp()
 
+    def set_recommendations(self, recs: Iterable[Recommendation]) -> None:
+        # Thay toàn bộ danh sách đề xuất bằng danh sách mới, update timestamp một lần
+        self.recommendations = list(recs)
+        self.update_timestamp()
+
     def to_dict(self) -> dict:
-        # Chuyển Conversation thành dict để lưu hoặc trả về API
+        # Chuyển Conversation thành dict để trả về API
+        # Chuyển từng tin nhắn thành dict
+        return self._serialize([m.to_dict() for m in self.messages])
+
+    def to_document(self) -> dict:
+        # Dict để lưu MongoDB, tin nhắn giữ timestamp kiểu datetime (BSON Date)
+        return self._serialize([m.to_document() for m in self.messages])
+
+    def _serialize(self, messages: List[dict]) -> dict:
         base = super().to_dict()  # Lấy dict có sẵn từ lớp cha Entity (có thể bao gồm id, created_at, updated_at)
         base.update({
             'user_id': self.user_id,
             'topic': self.topic,
             'level': self.level,
-            # Chuyển từng tin nhắn thành dict
-            'messages': [m.to_dict() for m in self.messages],
+            'messages': messages,
             # Chuyển điểm tổng thể thành dict, hoặc None nếu không có
             'overall_score': self.overall_score.to_dict() if self.overall_score else None,
             # Chuyển danh sách đề xuất thành list dict
@@ -249,12 +373,12 @@ class Conversation(Entity):
             user_id=data.get('user_id', ''),
             topic=data.get('topic', ''),
             level=data.get('level', ''),
-            # Tạo list Message từ dict
-            messages=[Message.from_dict(d) for d in data.get('messages', [])],
+            # Tạo list Message từ dict (map chỉ tra Message.from_dict một lần cho cả danh sách)
+            messages=list(map(Message.from_dict, data.get('messages') or ())),
             # Tạo Score từ dict
             overall_score=Score.from_dict(data.get('overall_score')),
             # Tạo list Recommendation từ dict
-            recommendations=[Recommendation.from_dict(d) for d in data.get('recommendations', [])],
+            recommendations=list(map(Recommendation.from_dict, data.get('recommendations') or ())),
             # Enhanced fields
             conversation_mode=data.get('conversation_mode'),
             language=data.get('language', 'ja'),
@@ -266,10 +390,12 @@ class Conversation(Entity):
         if data.get('_id'):
             # Nếu _id đã là ObjectId thì giữ nguyên, nếu là chuỗi thì chuyển sang ObjectId
             instance._id = data['_id'] if isinstance(data['_id'], ObjectId) else ObjectId(str(data['_id']))
-        # Cập nhật thời gian tạo nếu có và đúng kiểu datetime
-        if 'created_at' in data and isinstance(data['created_at'], datetime):
-            instance.created_at = data['created_at']
+        # Cập nhật thời gian tạo nếu có (datetime hoặc chuỗi ISO như khi lưu qua to_document)
+        created_at = _to_datetime(data.get('created_at'))
+        if created_at:
+            instance.created_at = created_at
         # Cập nhật thời gian sửa đổi nếu có
-        if 'updated_at' in data and isinstance(data['updated_at'], datetime):
-            instance.updated_at = data['updated_at']
+        updated_at = _to_datetime(data.get('updated_at'))
+        if updated_at:
+            instance.updated_at = updated_at
         return instance
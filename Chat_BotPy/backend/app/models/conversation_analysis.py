@@ -12,7 +12,7 @@ from .base import Entity
 from .enums import JLPTLevel
 
 
-@dataclass
+@dataclass(slots=True)
 class AnalysisScores:
     """Detailed scores for conversation analysis"""
     grammar: float = 0.0
@@ -40,7 +40,7 @@ class AnalysisScores:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class AnalysisErrors:
     """Error details from conversation analysis"""
     grammar: List[str] = None
@@ -73,6 +73,12 @@ class ConversationAnalysis(Entity):
     Detailed analysis of a conversation session
     Separate model to allow multiple analyses and historical tracking
     """
+    # created_at/updated_at/_id come from BaseModel's slots
+    __slots__ = (
+        'conversation_id', 'user_id', 'jlpt_estimation', 'scores', 'errors',
+        'common_mistakes', 'keigo_usage',
+    )
+
     def __init__(
         self,
         conversation_id: str,
@@ -104,35 +110,46 @@ class ConversationAnalysis(Entity):
             'errors': self.errors.to_dict(),
             'common_mistakes': self.common_mistakes,
             'keigo_usage': self.keigo_usage,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'created_at': self._created_at_iso(),
         })
         return base
 
     @classmethod
     def from_dict(cls, data: dict) -> ConversationAnalysis:
+        get = data.get
+        # pymongo returns BSON dates as datetime; ISO strings only appear in legacy rows
+        created_at = get('created_at')
+        if not isinstance(created_at, datetime):
+            if isinstance(created_at, str):
+                try:
+                    created_at = datetime.fromisoformat(created_at)
+                except ValueError:
+                    created_at = None
+            else:
+                created_at = None
+
+        # Callers building from in-memory objects may already pass the nested models
+        scores = get('scores')
+        if not isinstance(scores, AnalysisScores):
+            scores = AnalysisScores.from_dict(scores)
+        errors = get('errors')
+        if not isinstance(errors, AnalysisErrors):
+            errors = AnalysisErrors.from_dict(errors)
+
         instance = cls(
-            conversation_id=str(data.get('conversation_id', '')),
-            user_id=data.get('user_id', ''),
-            jlpt_estimation=data.get('jlpt_estimation'),
-            scores=AnalysisScores.from_dict(data.get('scores')),
-            errors=AnalysisErrors.from_dict(data.get('errors')),
-            common_mistakes=data.get('common_mistakes', []) or [],
-            keigo_usage=data.get('keigo_usage', {}) or {},
+            conversation_id=str(get('conversation_id', '')),
+            user_id=get('user_id', ''),
+            jlpt_estimation=get('jlpt_estimation'),
+            scores=scores,
+            errors=errors,
+            common_mistakes=get('common_mistakes', []) or [],
+            keigo_usage=get('keigo_usage', {}) or {},
+            created_at=created_at,
         )
-        
-        if data.get('_id'):
+
+        if get('_id'):
             instance._id = data['_id'] if isinstance(data['_id'], ObjectId) else ObjectId(str(data['_id']))
-        
-        if 'created_at' in data:
-            created_at_value = data['created_at']
-            if isinstance(created_at_value, str):
-                try:
-                    instance.created_at = datetime.fromisoformat(created_at_value)
-                except ValueError:
-                    instance.created_at = datetime.utcnow()
-            elif isinstance(created_at_value, datetime):
-                instance.created_at = created_at_value
-        
+
         return instance
 
 
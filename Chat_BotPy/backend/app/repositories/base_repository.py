@@ -1,13 +1,51 @@
-﻿from abc import ABC, abstractmethod
-from typing import List, Generic, TypeVar, Optional
+﻿import logging
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import List, Generic, Iterable, Iterator, Tuple, TypeVar, Optional
 from bson import ObjectId
+from bson.errors import InvalidId
 from pymongo.collection import Collection
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Lỗi phía DB: được log lại kèm traceback và trả giá trị mặc định
+# Id không hợp lệ (InvalidId, hoặc TypeError khi id không phải chuỗi) là lỗi dữ liệu từ client
+# nên được bắt riêng, chỉ log warning
+# Các lỗi khác (bug lập trình) không bị nuốt để lộ ra ở tầng trên
+DB_ERRORS = (PyMongoError,)
 
 # T là kiểu dữ liệu tổng quát (Generic Type)
 # cho phép class này làm việc với bất kỳ kiểu đối tượng nào (User, Conversation,...)
 T = TypeVar('T')
 
 
+# Chuỗi không hợp lệ vẫn raise InvalidId như ObjectId(id) và không bị cache
+_parse_object_id = lru_cache(maxsize=4096)(ObjectId)
+
+
+def to_object_id(id: str) -> ObjectId:
+    """
+    Chuyển chuỗi id thành ObjectId, có cache vì cùng một id thường được dùng
+    nhiều lần trong một request (find rồi update)
+    Chỉ cache đầu vào kiểu str; giá trị khác gọi thẳng ObjectId(id) như cũ
+    (None -> ObjectId mới mỗi lần, kiểu không hợp lệ -> TypeError)
+    """
+    if isinstance(id, str):
+        return _parse_object_id(id)
+    return ObjectId(id)
+
+
+# Số document tối đa server trả về trong một batch của cursor
+_MAX_BATCH_SIZE = 200
+
+
+def _batch_size(limit: int) -> int:
+    # limit = 0 nghĩa là không giới hạn -> dùng batch tối đa
+    return min(limit, _MAX_BATCH_SIZE) if limit > 0 else _MAX_BATCH_SIZE
+
+
 # ------------------------- LỚP TRỪU TƯỢNG (INTERFACE) -------------------------
 class IRepository(ABC, Generic[T]):
     """
@@ -57,42 +95,94 @@ class BaseConversation(IRepository[T]):
     # ------------------ TÌM THEO ID ------------------
     def find_by_id(self, id: str) -> Optional[T]:
         try:
-            obj_id = ObjectId(id)  # chuyển chuỗi id thành ObjectId để MongoDB hiểu
+            obj_id = to_object_id(id)  # chuyển chuỗi id thành ObjectId để MongoDB hiểu
             data = self.collection.find_one({'_id': obj_id})  # tìm document trong Mongo theo _id
             return self.model_class.from_dict(data) if data else None
             # from_dict là chuyển dữ liệu từ dict → Python object ( dùng để đọc dữ liệu từ MongoDB)
-        except Exception as e:
-            print(f"Lỗi tìm theo ID: {e}")
+        except (InvalidId, TypeError):
+            logger.warning("Id không hợp lệ: %s", id)
+            return None
+        except DB_ERRORS:
+            logger.exception("Lỗi tìm theo ID: %s", id)
             return None
 
     # ------------------ LẤY TẤT CẢ DỮ LIỆU ------------------
     def find_all(self, skip: int = 0, limit: int = 20) -> List[T]:
         try:
-            data_cursor = self.collection.find().skip(skip).limit(limit)
+            data_cursor = self.collection.find(batch_size=_batch_size(limit)).skip(skip).limit(limit)
             # find() trả về Cursor chứa nhiều document
-            # skip/limit dùng để phân trang
-            return [self.model_class.from_dict(doc) for doc in data_cursor]
+            # skip/limit dùng để phân trang, batch_size để cả trang về trong ít lượt getMore nhất
+            docs = list(data_cursor)  # lấy hết document của trang một lần rồi mới chuyển đổi
+            from_dict = self.model_class.from_dict
+            return [from_dict(doc) for doc in docs]
             # duyệt từng document và chuyển thành Python object
-        except Exception as e:
-            print(f"Lỗi find_all: {e}")
+        except DB_ERRORS:
+            logger.exception("Lỗi find_all")
             return []
 
     # ------------------ TẠO MỚI ĐỐI TƯỢNG ------------------
     def create(self, entity: T) -> T:
         try:
-            data = entity.to_dict()  # lấy entity chuyển thành dạng dict để sau đó lưu vào biến data
+            data = entity.to_document()  # lấy entity chuyển thành dạng dict để lưu DB (giữ kiểu BSON gốc như datetime)
             data.pop('id', None)  # xoá trường id ở dữ liệu, tại vì MongoDB tự sinh _id
             result = self.collection.insert_one(data)  # Gọi hàm insert_one() của PyMongo để chèn document vào MongoDB
             entity._id = result.inserted_id  # gán _id MongoDB vừa tạo cho entity hiện tại
             return entity  # trả về lại entity (lúc này đã có _id)
-        except Exception as e:#Nếu bất kỳ lỗi nào (Exception) xảy ra trong khối try,thì gán thông tin lỗi đó vào biến e và chạy đoạn code trong except.
-            print(f"Lỗi tạo entity: {e}")
+        except DB_ERRORS:#Nếu lỗi DB xảy ra trong khối try thì log lại (kèm traceback) rồi raise tiếp lên tầng trên.
+            logger.exception("Lỗi tạo entity")
+            raise
+
+    def create_many(self, entities: List[T]) -> List[T]:
+        """Insert nhiều entity trong một round-trip (insert_many)"""
+        if not entities:
+            return entities  # insert_many không nhận danh sách rỗng
+        try:
+            docs = []
+            for entity in entities:
+                data = entity.to_document()
+                data.pop('id', None)  # MongoDB tự sinh _id
+                docs.append(data)
+            result = self.collection.insert_many(docs, ordered=False)
+            # inserted_ids theo đúng thứ tự docs, gán lại _id cho từng entity
+            for entity, inserted_id in zip(entities, result.inserted_ids):
+                entity._id = inserted_id
+            return entities
+        except DB_ERRORS:
+            logger.exception("Lỗi tạo nhiều entity")
             raise
 
+    def bulk_update(self, items: Iterable[Tuple[str, T]]) -> int:
+        """
+        Cập nhật nhiều entity trong một round-trip (bulk_write)
+
+        Args:
+            items: các cặp (id, entity) cần cập nhật
+
+        Returns:
+            Số document đã được thay đổi
+        """
+        try:
+            operations = []
+            for id, entity in items:
+                entity.update_timestamp()
+                data = entity.to_document()
+                data.pop('id', None)
+                operations.append(UpdateOne({'_id': to_object_id(id)}, {'$set': data}))
+            if not operations:
+                return 0
+            result = self.collection.bulk_write(operations, ordered=False)
+            return result.modified_count
+        except (InvalidId, TypeError):
+            logger.warning("Invalid id in bulk update, nothing written")
+            return 0
+        except DB_ERRORS:
+            logger.exception("Error bulk updating entities")
+            return 0
+
     def update(self, id: str, entity: T) -> Optional[T]:
         """Update existing entity"""
         try:
-            object_id = ObjectId(id)
+            object_id = to_object_id(id)
             # Chuyển id từ chuỗi (string) → ObjectId để MongoDB có thể hiểu và truy vấn
             # Vì trong MongoDB, _id là kiểu ObjectId chứ không phải string
 
@@ -100,7 +190,7 @@ class BaseConversation(IRepository[T]):
             # Gọi hàm update_timestamp() để cập nhật lại thời gian sửa đổi (nếu model có thuộc tính này)
             # Ví dụ: updated_at = datetime.now()
 
-            data = entity.to_dict()
+            data = entity.to_document()
             # Chuyển object entity (Python class) → dict (định dạng có thể lưu vào MongoDB)
 
             data.pop('id', None)
@@ -120,8 +210,11 @@ class BaseConversation(IRepository[T]):
             return None
             # Ngược lại (không có document nào bị cập nhật) → trả về None
 
-        except Exception as e:
-            print(f"Error updating entity: {e}")
+        except (InvalidId, TypeError):
+            logger.warning("Invalid id for update: %s", id)
+            return None
+        except DB_ERRORS:
+            logger.exception("Error updating entity %s", id)
             # Nếu có bất kỳ lỗi nào trong quá trình (ví dụ id sai, kết nối Mongo lỗi, v.v.)
             # Thì in ra thông tin lỗi để dễ debug
             return None
@@ -129,7 +222,7 @@ class BaseConversation(IRepository[T]):
     def delete(self, id: str) -> bool:
         """Delete entity"""
         try:
-            object_id = ObjectId(id)
+            object_id = to_object_id(id)
             # Chuyển id từ kiểu string → ObjectId (vì MongoDB lưu _id dạng ObjectId)
             # Nếu không chuyển, MongoDB sẽ không tìm thấy document cần xóa
 
@@ -141,32 +234,72 @@ class BaseConversation(IRepository[T]):
             # Nếu deleted_count > 0 → tức là đã xóa thành công ít nhất 1 document
             # Trả về True (thành công), ngược lại False (không có gì bị xóa)
 
-        except Exception as e:
-            print(f"Error deleting entity: {e}")
+        except (InvalidId, TypeError):
+            logger.warning("Invalid id for delete: %s", id)
+            return False
+        except DB_ERRORS:
+            logger.exception("Error deleting entity %s", id)
             # Nếu có lỗi (ví dụ id không hợp lệ, không kết nối được DB, v.v.)
             # Thì in ra thông báo lỗi để dễ debug
             return False
             # Trả về False để báo hiệu thao tác xóa thất bại
 
-    def find_by_query(self, query: dict, skip: int = 0, limit: int = 20) -> List[T]:
+    def find_by_query(
+            self,
+            query: dict,
+            skip: int = 0,
+            limit: int = 20,
+            projection: Optional[dict] = None,
+    ) -> List[T]:
         """Find entities by custom query"""
         try:
-            cursor = self.collection.find(query).skip(skip).limit(limit)
+            cursor = self.collection.find(query, projection, batch_size=_batch_size(limit)).skip(skip).limit(limit)
             # Gọi hàm find() của PyMongo với điều kiện lọc (query)
+            # projection (tuỳ chọn) để bỏ bớt field không cần, ví dụ {'messages': 0} khi chỉ cần metadata
             # skip() và limit() dùng để phân trang — bỏ qua 'skip' document đầu, và chỉ lấy tối đa 'limit' document
 
-            return [self.model_class.from_dict(doc) for doc in cursor]
-            # Duyệt qua từng document trong cursor (dạng dict)
+            docs = list(cursor)
+            # Lấy toàn bộ trang về một lần (batch_size = limit nên thường chỉ 1 round-trip)
+            from_dict = self.model_class.from_dict
+            return [from_dict(doc) for doc in docs]
+            # Duyệt qua từng document (dạng dict)
             # Mỗi document được chuyển về object Python thông qua from_dict()
             # Trả về danh sách (list) các object
 
-        except Exception as e:
-            print(f"Error finding by query: {e}")
+        except DB_ERRORS:
+            logger.exception("Error finding by query")
             # Nếu có lỗi (ví dụ query sai cú pháp, DB lỗi, v.v.)
             # Thì in ra thông tin lỗi
             return []
             # Trả về list rỗng nếu có lỗi
 
+    def iter_by_query(
+            self,
+            query: dict,
+            skip: int = 0,
+            limit: int = 0,
+            projection: Optional[dict] = None,
+    ) -> Iterator[T]:
+        """
+        Giống find_by_query nhưng trả về generator: mỗi document được chuyển thành object
+        ngay khi cursor trả về, không giữ toàn bộ kết quả trong bộ nhớ (dùng cho export, quét dài)
+        limit = 0 nghĩa là không giới hạn số document
+        """
+        try:
+            cursor = self.collection.find(
+                query,
+                projection,
+                batch_size=_MAX_BATCH_SIZE,
+                no_cursor_timeout=False,
+            ).skip(skip).limit(limit)
+            # driver tự lấy batch tiếp theo (getMore) khi batch hiện tại đã duyệt hết
+            from_dict = self.model_class.from_dict
+            for doc in cursor:
+                yield from_dict(doc)
+        except DB_ERRORS:
+            logger.exception("Error iterating by query")
+            # dừng generator, các object đã yield trước đó vẫn giữ nguyên
+
     def count(self, query: Optional[dict] = None) -> int:
         """Count entities matching query"""
         try:
@@ -175,8 +308,8 @@ class BaseConversation(IRepository[T]):
             # Nếu query = None → mặc định đếm tất cả document trong collection
             # query or {} có nghĩa là: nếu query không có, thì dùng dict rỗng {}
 
-        except Exception as e:
-            print(f"Error counting: {e}")
+        except DB_ERRORS:
+            logger.exception("Error counting")
             # Nếu có lỗi (ví dụ mất kết nối DB, query sai, v.v.)
             # Thì in ra lỗi để debug
             return 0
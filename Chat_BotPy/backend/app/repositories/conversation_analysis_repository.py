@@ -2,11 +2,15 @@
 ConversationAnalysis Repository
 Handles database operations for ConversationAnalysis
 """
+import logging
 from typing import List, Optional
-from bson import ObjectId
+from bson.errors import InvalidId
 from pymongo.collection import Collection
 
 from app.models.conversation_analysis import ConversationAnalysis
+from .base_repository import DB_ERRORS, to_object_id
+
+logger = logging.getLogger(__name__)
 
 
 class ConversationAnalysisRepository:
@@ -28,11 +32,15 @@ class ConversationAnalysisRepository:
     def find_by_id(self, analysis_id: str) -> Optional[ConversationAnalysis]:
         """Find analysis by ID"""
         try:
-            doc = self.collection.find_one({'_id': ObjectId(analysis_id)})
+            doc = self.collection.find_one({'_id': to_object_id(analysis_id)})
             if doc:
                 return ConversationAnalysis.from_dict(doc)
             return None
-        except Exception:
+        except (InvalidId, TypeError):
+            logger.warning("Invalid analysis id: %s", analysis_id)
+            return None
+        except DB_ERRORS:
+            logger.exception("Error finding analysis %s", analysis_id)
             return None
 
     def find_by_conversation_id(self, conversation_id: str) -> Optional[ConversationAnalysis]:
@@ -44,7 +52,8 @@ class ConversationAnalysisRepository:
             if doc:
                 return ConversationAnalysis.from_dict(doc)
             return None
-        except Exception:
+        except DB_ERRORS:
+            logger.exception("Error finding analysis for conversation %s", conversation_id)
             return None
 
     def find_by_user_id(
@@ -65,21 +74,30 @@ class ConversationAnalysisRepository:
         try:
             data = analysis.to_dict()
             # Keep original _id
-            data['_id'] = ObjectId(analysis_id)
+            object_id = to_object_id(analysis_id)
+            data['_id'] = object_id
             result = self.collection.replace_one(
-                {'_id': ObjectId(analysis_id)},
+                {'_id': object_id},
                 data
             )
             return result.modified_count > 0
-        except Exception:
+        except (InvalidId, TypeError):
+            logger.warning("Invalid analysis id: %s", analysis_id)
+            return False
+        except DB_ERRORS:
+            logger.exception("Error updating analysis %s", analysis_id)
             return False
 
     def delete(self, analysis_id: str) -> bool:
         """Delete an analysis"""
         try:
-            result = self.collection.delete_one({'_id': ObjectId(analysis_id)})
+            result = self.collection.delete_one({'_id': to_object_id(analysis_id)})
             return result.deleted_count > 0
-        except Exception:
+        except (InvalidId, TypeError):
+            logger.warning("Invalid analysis id: %s", analysis_id)
+            return False
+        except DB_ERRORS:
+            logger.exception("Error deleting analysis %s", analysis_id)
             return False
 
 
@@ -1,10 +1,43 @@
 ﻿from __future__ import annotations  # Cho phép dùng kiểu annotation tham chiếu trong class
-from typing import List, Optional, Dict, Any  # Kiểu dữ liệu chuẩn để gõ kiểu (type hint)
+import logging  # Ghi log lỗi thay cho print
+import threading  # Khoá để chỉ tạo index một lần khi nhiều request chạy song song
+from datetime import datetime  # Thời điểm cập nhật khi chỉ ghi một phần document
+from typing import Iterable, List, Optional, Dict, Any  # Kiểu dữ liệu chuẩn để gõ kiểu (type hint)
 from pymongo.collection import Collection  # Lớp đại diện cho Collection trong MongoDB
 from bson import ObjectId  # Định dạng ID chuẩn của MongoDB
 
-from app.models.conversation import Conversation  # Model Conversation định nghĩa dữ liệu cuộc hội thoại
-from .base_repository import BaseConversation  # Lớp repository base đã implement CRUD chung
+from pymongo import ASCENDING, DESCENDING, UpdateOne  # Thứ tự sắp xếp khi khai báo index, thao tác bulk
+
+from app.models.conversation import Conversation, ConversationSummary, Message, Score  # Model Conversation định nghĩa dữ liệu cuộc hội thoại
+from bson.errors import InvalidId  # Lỗi khi chuỗi id không phải ObjectId hợp lệ
+
+from .base_repository import BaseConversation, DB_ERRORS, _MAX_BATCH_SIZE, _batch_size, to_object_id  # Lớp repository base đã implement CRUD chung
+
+logger = logging.getLogger(__name__)
+
+# Index phục vụ truy vấn theo user và lấy hội thoại mới nhất (get_user_statistics, find_by_user_id)
+_USER_UPDATED_INDEX = [('user_id', ASCENDING), ('updated_at', DESCENDING)]
+# Mỗi blueprint tạo repository riêng cho cùng collection, nên ghi nhớ các collection đã tạo index ở cấp module
+_indexed_collections: set = set()
+# Projection chỉ lấy metadata cho danh sách hội thoại
+_SUMMARY_PROJECTION = dict.fromkeys(ConversationSummary.FIELDS, 1)
+_index_lock = threading.Lock()
+
+
+def _ensure_indexes(collection: Collection) -> None:
+    # create_index là idempotent nhưng vẫn tốn một round-trip, nên mỗi collection chỉ gọi một lần
+    key = collection.full_name
+    if key in _indexed_collections:
+        return
+    with _index_lock:
+        if key in _indexed_collections:
+            return
+        try:
+            collection.create_index(_USER_UPDATED_INDEX)
+        except DB_ERRORS:
+            logger.exception("Lỗi tạo index cho %s", key)
+            return
+        _indexed_collections.add(key)
 
 
 class ConversationRepository(BaseConversation[Conversation]):
@@ -12,31 +45,140 @@ class ConversationRepository(BaseConversation[Conversation]):
         # Gọi constructor của lớp cha BaseConversation với collection và model Conversation
         # collection ở đây chính là MongoDB collection để lưu trữ cuộc hội thoại
         super().__init__(collection, Conversation)
+        _ensure_indexes(collection)
 
-    def find_by_user_id(self, user_id: str, skip: int = 0, limit: int = 20) -> List[Conversation]:
+    def find_by_user_id(
+            self,
+            user_id: str,
+            skip: int = 0,
+            limit: int = 20,
+            projection: Optional[dict] = None,
+    ) -> List[Conversation]:
         # Hàm tìm tất cả các cuộc hội thoại của một user cụ thể, có phân trang
+        # projection cho phép bỏ field nặng (vd {'messages': 0}) khi chỉ cần metadata
         query = {'user_id': user_id}  # Điều kiện lọc: chỉ lấy document có user_id tương ứng
-        return self.find_by_query(query, skip, limit)
+        return self.find_by_query(query, skip, limit, projection)
         # Gọi lại hàm tìm theo query của lớp cha BaseConversation
 
+    def find_summaries_by_user_id(
+            self,
+            user_id: str,
+            skip: int = 0,
+            limit: int = 20,
+    ) -> List[ConversationSummary]:
+        # Danh sách hội thoại rút gọn của user: không tải messages nên không phải dựng lại
+        # từng Message/MessageAnalysis, payload từ Mongo nhỏ hơn nhiều
+        # Sắp xếp mới nhất trước theo đúng index user_id + updated_at nên skip/limit
+        # đi theo index thay vì phải sort trong bộ nhớ
+        try:
+            cursor = self.collection.find(
+                {'user_id': user_id},
+                _SUMMARY_PROJECTION,
+                batch_size=_batch_size(limit),
+            ).sort('updated_at', DESCENDING).skip(skip).limit(limit)
+            return [ConversationSummary.from_dict(doc) for doc in list(cursor)]
+        except DB_ERRORS:
+            logger.exception("Error finding summaries for user %s", user_id)
+            return []
+
+    def append_messages(
+            self,
+            conversation_id: str,
+            messages: Iterable[Message],
+            overall_score: Optional[Score] = None,
+            updated_at: Optional[datetime] = None,
+    ) -> bool:
+        # Chỉ ghi phần thay đổi của một lượt chat: $push các message mới vào cuối mảng
+        # và $set overall_score/updated_at, thay vì ghi lại toàn bộ document như update()
+        # (payload không còn tăng theo độ dài lịch sử hội thoại)
+        fields: Dict[str, Any] = {
+            # cùng định dạng chuỗi ISO như BaseModel.to_dict()
+            'updated_at': (updated_at or datetime.utcnow()).isoformat(),
+        }
+        if overall_score is not None:
+            fields['overall_score'] = overall_score.to_dict()
+        try:
+            result = self.collection.update_one(
+                {'_id': to_object_id(conversation_id)},
+                {
+                    '$push': {'messages': {'$each': [m.to_document() for m in messages]}},
+                    '$set': fields,
+                },
+            )
+            return result.modified_count > 0
+        except (InvalidId, TypeError):
+            logger.warning("Invalid conversation id: %s", conversation_id)
+            return False
+        except DB_ERRORS:
+            logger.exception("Error appending messages to conversation %s", conversation_id)
+            return False
+
+    def migrate_message_timestamps(self) -> int:
+        # Chuyển messages.timestamp dạng chuỗi ISO (dữ liệu cũ) sang BSON Date, trả về số
+        # document đã cập nhật. Document mới đã lưu timestamp kiểu datetime qua Message.to_document()
+        # - Parse bằng datetime.fromisoformat giống Message.from_dict, nên kết quả đúng như khi app
+        #   đọc dữ liệu cũ (có/không microsecond, có offset -> PyMongo lưu theo UTC)
+        # - Chuỗi không parse được giữ nguyên (không tự bịa ra thời điểm)
+        # - Chạy lại an toàn: chỉ ghi khi timestamp vẫn là đúng chuỗi đã đọc, lần sau không còn gì để đổi
+        modified = 0
+        operations = []
+        cursor = self.collection.find(
+            {'messages.timestamp': {'$type': 'string'}},
+            {'messages.timestamp': 1},  # projection giữ nguyên vị trí phần tử trong mảng
+            batch_size=_MAX_BATCH_SIZE,
+        )
+        for doc in cursor:
+            condition = {'_id': doc['_id']}
+            fields = {}
+            for i, message in enumerate(doc.get('messages') or ()):
+                value = message.get('timestamp') if isinstance(message, dict) else None
+                if not isinstance(value, str):
+                    continue
+                try:
+                    parsed = datetime.fromisoformat(value)
+                except ValueError:
+                    continue
+                key = f'messages.{i}.timestamp'
+                condition[key] = value
+                fields[key] = parsed
+            if fields:
+                operations.append(UpdateOne(condition, {'$set': fields}))
+            if len(operations) >= _MAX_BATCH_SIZE:
+                modified += self.collection.bulk_write(operations, ordered=False).modified_count
+                operations = []
+        if operations:
+            modified += self.collection.bulk_write(operations, ordered=False).modified_count
+        return modified
+
     def get_user_statistics(self, user_id: str) -> Dict[str, Any]:
         # Hàm lấy thống kê liên quan đến user, bao gồm:
         # - tổng số cuộc hội thoại user đã có
         # - điểm số cuối cùng của user trong cuộc hội thoại gần nhất
 
-        total_conversations = self.count({'user_id': user_id})
-        # Đếm tổng số cuộc hội thoại của user (dùng hàm đếm của BaseConversation)
+        pipeline = [
+            {'$match': {'user_id': user_id}},
+            {'$facet': {
+                'total': [{'$count': 'n'}],
+                'last': [
+                    {'$sort': {'updated_at': -1}},
+                    {'$limit': 1},
+                    {'$project': {'overall_score': 1}},
+                ],
+            }},
+        ]
+        # Dùng $facet để đếm tổng số hội thoại và lấy hội thoại mới nhất trong cùng một round-trip
+        # (match dùng được index user_id + updated_at)
+        result = next(self.collection.aggregate(pipeline), None) or {}
 
-        last_doc = self.collection.find({'user_id': user_id}).sort('updated_at', -1).limit(1)
-        # Lấy document hội thoại cuối cùng của user dựa trên thời gian cập nhật (updated_at giảm dần)
-        # limit(1) để chỉ lấy 1 document gần nhất
+        total = result.get('total') or []
+        total_conversations = total[0]['n'] if total else 0
+        # $count không trả về document nào khi user chưa có hội thoại -> 0
 
+        last = result.get('last') or []
         last_score = None
-        for d in last_doc:
-            conv = Conversation.from_dict(d)
-            # Chuyển dict lấy từ DB thành object Conversation
-            last_score = conv.overall_score.to_dict() if conv and conv.overall_score else None
-            # Lấy điểm tổng kết (overall_score) của cuộc hội thoại gần nhất nếu có
+        if last:
+            last_score = Score.from_dict(last[0].get('overall_score')).to_dict()
+            # Chuẩn hoá điểm tổng kết (overall_score) của cuộc hội thoại gần nhất như Score.to_dict()
 
         return {
             'total_conversations': total_conversations,
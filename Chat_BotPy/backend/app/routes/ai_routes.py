@@ -1,5 +1,8 @@
 
-from flask import Blueprint, request, jsonify, g
+import threading
+from typing import Optional
+
+from flask import Blueprint, jsonify, g
 from app.controllers.ai_controller import AIController
 from app.repositories.conversation_repository import ConversationRepository
 from app.repositories.conversation_analysis_repository import ConversationAnalysisRepository
@@ -17,18 +20,33 @@ from app import mongo
 bp = Blueprint('ai', __name__)
 
 
+# The controller and its dependencies hold no per-request state, so build
+# them on first use (mongo.db only exists once the app is initialised) and
+# reuse them for every later request. The lock keeps concurrent first
+# requests (gthread workers) from each building their own controller.
+_ai_controller: Optional[AIController] = None
+_ai_controller_lock = threading.Lock()
+
+
 def _get_ai_controller() -> AIController:
     """Get AI controller with dependencies"""
-    conversation_repo = ConversationRepository(mongo.db.conversations)
-    analysis_repo = ConversationAnalysisRepository(mongo.db.conversation_analyses)
-    ai_service = create_service()
-    scoring_service = ScoringService()
-    return AIController(
-        conversation_repo=conversation_repo,
-        conversation_analysis_repo=analysis_repo,
-        ai_service=ai_service,
-        scoring_service=scoring_service,
-    )
+    global _ai_controller
+    controller = _ai_controller
+    if controller is None:
+        with _ai_controller_lock:
+            if _ai_controller is None:
+                conversation_repo = ConversationRepository(mongo.db.conversations)
+                analysis_repo = ConversationAnalysisRepository(mongo.db.conversation_analyses)
+                ai_service = create_service()
+                scoring_service = ScoringService()
+                _ai_controller = AIController(
+                    conversation_repo=conversation_repo,
+                    conversation_analysis_repo=analysis_repo,
+                    ai_service=ai_service,
+                    scoring_service=scoring_service,
+                )
+            controller = _ai_controller
+    return controller
 
 
 chat_schema = AIChatRequestSchema()
@@ -88,7 +106,7 @@ def ai_chat():
       400:
         description: Validation or routing error
     """
-    data = request.get_json()
+    data = g.json_body
     controller = _get_ai_controller()
     
     if not data.get('conversation_id'):
@@ -152,7 +170,7 @@ def ai_evaluate():
       404:
         description: Conversation not found
     """
-    data = request.get_json()
+    data = g.json_body
     controller = _get_ai_controller()
     
     try:
@@ -205,7 +223,7 @@ def ai_correct_sentence():
       400:
         description: Validation error
     """
-    data = request.get_json()
+    data = g.json_body
     controller = _get_ai_controller()
     
     result = controller.correct_sentence(
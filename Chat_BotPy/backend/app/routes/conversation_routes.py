@@ -1,8 +1,12 @@
-﻿from flask import Blueprint, request, jsonify, g
+﻿import threading
+from hashlib import blake2b
+from typing import Optional
+
+from flask import Blueprint, request, jsonify, g, make_response
 from app.controllers.conversation_controller import ConversationController
 from app.repositories.conversation_repository import ConversationRepository
 from app.services.ai.ai_factory import create_service
-from app.utils.decorators import handle_errors, validate_json, require_auth
+from app.utils.decorators import handle_errors, validate_json, require_auth, conditional_get
 from app.auth.jwt_auth import require_roles
 from app.schemas.conversation_schema import (
     ConversationCreateSchema,
@@ -15,15 +19,30 @@ from app.config import settings
 bp = Blueprint('conversations', __name__)
 
 
+# Controller, repository và AI service không giữ state theo request (cache theo
+# request nằm trong flask.g), nên chỉ tạo một lần ở lần gọi đầu tiên
+# (lúc đó mongo.db đã được khởi tạo) rồi dùng lại cho các request sau;
+# khoá để các thread gthread cùng gọi lần đầu không tạo hai controller
+_controller: Optional[ConversationController] = None
+_controller_lock = threading.Lock()
+
+
 def _get_controller() -> ConversationController:
-    # Access mongo.db within app/request context
-    conversation_repo = ConversationRepository(mongo.db.conversations)
-    ai_service = create_service()
-    return ConversationController(
-        conversation_repo=conversation_repo,
-        ai_service=ai_service,
-        course_service_base_url=settings.COURSE_SERVICE_BASE_URL,
-    )
+    global _controller
+    controller = _controller
+    if controller is None:
+        with _controller_lock:
+            if _controller is None:
+                # Access mongo.db within app/request context
+                conversation_repo = ConversationRepository(mongo.db.conversations)
+                ai_service = create_service()
+                _controller = ConversationController(
+                    conversation_repo=conversation_repo,
+                    ai_service=ai_service,
+                    course_service_base_url=settings.COURSE_SERVICE_BASE_URL,
+                )
+            controller = _controller
+    return controller
 
 
 create_schema = ConversationCreateSchema()
@@ -63,7 +82,7 @@ def create_conversation():
       400:
         description: Validation error
     """
-    data = request.get_json()
+    data = g.json_body
     controller = _get_controller()
     conversation = controller.create_conversation(
         user_id=data['user_id'],
@@ -76,6 +95,7 @@ def create_conversation():
 @bp.route('/<conversation_id>', methods=['GET'])
 @handle_errors
 # @require_auth  # <-- Thêm xác thực
+@conditional_get
 def get_conversation(conversation_id: str):
     """
     Get conversation by ID
@@ -97,7 +117,18 @@ def get_conversation(conversation_id: str):
     conversation = controller.get_conversation(conversation_id)
     if not conversation:
         return jsonify({'error': 'Conversation not found'}), 404
-    return jsonify(conversation.to_dict())
+    # Mọi thao tác ghi đều cập nhật updated_at, nên ETag lấy từ đó: client đã có bản
+    # mới nhất thì trả 304 ngay, không phải serialize lại toàn bộ messages
+    etag = blake2b(
+        f"{conversation._id}:{conversation.updated_at}:{len(conversation.messages)}".encode(),
+        digest_size=8,
+    ).hexdigest()
+    if request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+    else:
+        response = jsonify(conversation.to_dict())
+    response.set_etag(etag, weak=True)
+    return response
 
 
 @bp.route('/<conversation_id>/messages', methods=['POST'])
@@ -136,7 +167,7 @@ def send_message(conversation_id: str):
       404:
         description: Not found
     """
-    data = request.get_json()
+    data = g.json_body
     controller = _get_controller()
     try:
         result = controller.send_message(
@@ -152,6 +183,7 @@ def send_message(conversation_id: str):
 @bp.route('/<conversation_id>/recommendations', methods=['GET'])
 @handle_errors
 # @require_auth  # <-- Thêm xác thực
+@conditional_get
 def get_recommendations(conversation_id: str):
     """
     Get course recommendations for a conversation
@@ -181,6 +213,7 @@ def get_recommendations(conversation_id: str):
 @bp.route('/users/<user_id>', methods=['GET'])
 @handle_errors
 # @require_auth  # <-- Thêm xác thực
+@conditional_get
 def get_user_conversations(user_id: str):
     """
     List conversations by user
@@ -200,20 +233,31 @@ def get_user_conversations(user_id: str):
         name: limit
         type: integer
         required: false
+      - in: query
+        name: summary
+        type: boolean
+        required: false
+        description: Chỉ trả metadata (không kèm messages/recommendations), mới nhất trước
     responses:
       200:
         description: List of conversations
     """
     skip = request.args.get('skip', 0, type=int)
     limit = request.args.get('limit', 20, type=int)
+    summary = request.args.get('summary', '').lower() in ('1', 'true')
     controller = _get_controller()
-    conversations = controller.get_user_conversations(user_id, skip, limit)
+    if summary:
+        # Màn hình danh sách chỉ cần metadata: Mongo chỉ trả các field tóm tắt
+        conversations = controller.get_user_conversation_summaries(user_id, skip, limit)
+    else:
+        conversations = controller.get_user_conversations(user_id, skip, limit)
     return jsonify([c.to_dict() for c in conversations])
 
 
 @bp.route('/users/<user_id>/statistics', methods=['GET'])
 @handle_errors
 # @require_auth  # <-- Thêm xác thực
+@conditional_get
 def get_user_statistics(user_id: str):
     """
     Get conversation statistics for a user
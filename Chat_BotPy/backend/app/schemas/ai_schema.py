@@ -1,7 +1,19 @@
 """
 Schemas for AI endpoints matching BRD/SRS specification
 """
-from marshmallow import Schema, fields, validate, validates, ValidationError
+from marshmallow import Schema, fields, validate
+
+from app.utils.validators import NotBlank, OneOfSet
+
+JLPT_LEVELS = ('N5', 'N4', 'N3', 'N2', 'N1')
+USER_ROLES = ('student', 'teacher', 'admin')
+LANGUAGES = ('ja',)
+CONVERSATION_MODES = (
+    'speaking_practice',
+    'role_play',
+    'jlpt_exam',
+    'free_conversation'
+)
 
 
 class AIChatRequestSchema(Schema):
@@ -10,25 +22,20 @@ class AIChatRequestSchema(Schema):
     user_id = fields.Str(required=True)
     role = fields.Str(
         required=True,
-        validate=validate.OneOf(['student', 'teacher', 'admin'])
+        validate=OneOfSet(USER_ROLES)
     )
     language = fields.Str(
         required=False,
         default='ja',
-        validate=validate.OneOf(['ja'])
+        validate=OneOfSet(LANGUAGES)
     )
     jlpt_target = fields.Str(
         required=True,
-        validate=validate.OneOf(['N5', 'N4', 'N3', 'N2', 'N1'])
+        validate=OneOfSet(JLPT_LEVELS)
     )
     conversation_mode = fields.Str(
         required=True,
-        validate=validate.OneOf([
-            'speaking_practice',
-            'role_play',
-            'jlpt_exam',
-            'free_conversation'
-        ])
+        validate=OneOfSet(CONVERSATION_MODES)
     )
     message = fields.Str(
         required=True,
@@ -41,7 +48,7 @@ class AIEvaluateRequestSchema(Schema):
     conversation_id = fields.Str(required=True)
     jlpt_target = fields.Str(
         required=True,
-        validate=validate.OneOf(['N5', 'N4', 'N3', 'N2', 'N1'])
+        validate=OneOfSet(JLPT_LEVELS)
     )
 
 
@@ -49,35 +56,8 @@ class AICorrectSentenceRequestSchema(Schema):
     """Schema for POST /api/v1/ai/correct-sentence"""
     sentence = fields.Str(
         required=True,
-        validate=validate.Length(min=1, max=500)
+        validate=[
+            validate.Length(min=1, max=500),
+            NotBlank(error="Sentence cannot be empty or whitespace"),
+        ]
     )
-
-    @validates('sentence')
-    def validate_sentence(self, value):
-        if not value.strip():
-            raise ValidationError("Sentence cannot be empty or whitespace")
-
-
-class AIChatResponseSchema(Schema):
-    """Response schema for /api/v1/ai/chat"""
-    reply = fields.Str(required=True)
-    conversation_id = fields.Str(required=True)
-
-
-class AIEvaluateResponseSchema(Schema):
-    """Response schema for /api/v1/ai/evaluate"""
-    jlpt_estimation = fields.Str(required=True)
-    scores = fields.Dict(required=True)
-    errors = fields.Dict(required=True)
-
-
-class AICorrectSentenceResponseSchema(Schema):
-    """Response schema for /api/v1/ai/correct-sentence"""
-    original = fields.Str(required=True)
-    corrected = fields.Str(required=True)
-    explanation_vi = fields.Str(required=True)
-
-
-
-
-
@@ -4,11 +4,14 @@ Chọn nhà cung cấp AI cụ thể dựa trên cấu hình settings.
 """
 from __future__ import annotations
 
+import logging
 from typing import Optional
 
 from app.config.settings import settings
 from .base_ai_service import BaseAIService, IAIService
 
+logger = logging.getLogger(__name__)
+
 
 class _MockAIService(BaseAIService):
     # Service giả lập cho mục đích test hoặc khi provider thật không hoạt động
@@ -44,7 +47,7 @@ def create_service() -> IAIService:
                 timeout=settings.REQUEST_TIMEOUT,
             )
         except Exception as e:
-            print(f"[AI Factory Error] Tạo MyAIService thất bại: {e}")
+            logger.warning("[AI Factory Error] Tạo MyAIService thất bại: %s", e)
             # Dùng service giả lập nếu thất bại
             return _MockAIService(api_key='', base_url='', model='mock')
 
@@ -56,10 +59,12 @@ def create_service() -> IAIService:
                 raise ValueError('OPENAI_API_KEY là bắt buộc khi AI_PROVIDER=openai')
 
             # In thông tin cấu hình để debug
-            print(f"[AI Factory] Tạo OpenAIService với:")
-            print(f"  - Địa chỉ Base URL: {settings.OPENAI_BASE_URL or 'https://api.openai.com/v1'}")
-            print(f"  - Model: {settings.OPENAI_MODEL or 'gpt-4'}")
-            print(f"  - API Key: {'*' * 10 if settings.OPENAI_API_KEY else 'CHƯA ĐẶT'}")
+            logger.debug(
+                "[AI Factory] Tạo OpenAIService với: base_url=%s, model=%s, api_key=%s",
+                settings.OPENAI_BASE_URL or 'https://api.openai.com/v1',
+                settings.OPENAI_MODEL or 'gpt-4',
+                '*' * 10 if settings.OPENAI_API_KEY else 'CHƯA ĐẶT',
+            )
 
             service = OpenAIService(
                 api_key=settings.OPENAI_API_KEY,
@@ -67,16 +72,16 @@ def create_service() -> IAIService:
                 model=settings.OPENAI_MODEL or 'gpt-4',
                 timeout=settings.REQUEST_TIMEOUT,
             )
-            print("[AI Factory] Tạo OpenAIService thành công")
+            logger.debug("[AI Factory] Tạo OpenAIService thành công")
             return service
         except Exception as e:
-            print(f"[AI Factory Error] Tạo OpenAIService thất bại: {type(e).__name__}: {e}")
-            import traceback
-            traceback.print_exc()
-            print("[AI Factory] Chuyển sang dùng MockAIService")
+            logger.exception(
+                "[AI Factory Error] Tạo OpenAIService thất bại: %s: %s, chuyển sang dùng MockAIService",
+                type(e).__name__, e,
+            )
             return _MockAIService(api_key='', base_url='', model='mock')
 
     else:
         # Nếu provider không nhận diện được, sử dụng service giả lập
-        print(f"[AI Factory Warning] Nhà cung cấp '{provider}' không xác định, sử dụng service giả lập")
+        logger.warning("[AI Factory Warning] Nhà cung cấp '%s' không xác định, sử dụng service giả lập", provider)
         return _MockAIService(api_key='', base_url='', model='mock')
@@ -1,5 +1,6 @@
 ﻿from abc import ABC, abstractmethod
-from typing import List, Dict, Optional
+from functools import lru_cache
+from typing import Iterable, List, Dict, Optional
 
 
 class IAIService(ABC):
@@ -11,7 +12,7 @@ class IAIService(ABC):
     @abstractmethod
     def chat(
             self,
-            messages: List[Dict[str, str]],
+            messages: Iterable[Dict[str, str]],
             topic: str,
             level: str
     ) -> str:
@@ -94,26 +95,7 @@ class BaseAIService(IAIService):
             Chuỗi prompt hệ thống cho AI
         """
         guidelines = self.LEVEL_GUIDELINES.get(level, self.LEVEL_GUIDELINES['N5'])
-
-        # Prompt hướng dẫn AI làm đối tác hội thoại cho người học tiếng Nhật
-        return f"""Bạn là đối tác hội thoại dành cho người học tiếng Nhật.
-
-【Cài đặt】
-- Chủ đề: {topic}
-- Mức độ: {level} ({guidelines})
-
-【Vai trò】
-- Hội thoại bằng tiếng Nhật tự nhiên phù hợp trình độ người học
-- Nhẹ nhàng sửa lỗi ngữ pháp và từ vựng
-- Giải thích đơn giản khi dạy biểu hiện mới
-- Đặt câu hỏi để tiếp tục hội thoại
-
-【Quy tắc】
-- Sử dụng ngữ pháp và từ vựng cấp độ {level}
-- Trả lời không quá dài (khoảng 2-3 câu)
-- Sử dụng đúng hiragana, katakana, kanji
-- Giọng điệu tự nhiên, thân thiện
-- Tuyệt đối không sử dụng tiếng Anh"""
+        return _system_prompt(topic, level, guidelines)
 
     def build_analysis_prompt(self, message: str, level: str) -> str:
         """
@@ -173,3 +155,30 @@ Vui lòng trả về kết quả chỉ dưới dạng JSON theo định dạng s
                 'feedback': 'Đã xảy ra lỗi trong quá trình phân tích'
             }
         }
+
+
+@lru_cache(maxsize=512)
+def _system_prompt(topic: str, level: str, guidelines: str) -> str:
+    """
+    Prompt hệ thống chỉ phụ thuộc (topic, level, guidelines), cache lại để
+    các lượt chat trong cùng cuộc hội thoại dùng chung một chuỗi
+    """
+    # Prompt hướng dẫn AI làm đối tác hội thoại cho người học tiếng Nhật
+    return f"""Bạn là đối tác hội thoại dành cho người học tiếng Nhật.
+
+【Cài đặt】
+- Chủ đề: {topic}
+- Mức độ: {level} ({guidelines})
+
+【Vai trò】
+- Hội thoại bằng tiếng Nhật tự nhiên phù hợp trình độ người học
+- Nhẹ nhàng sửa lỗi ngữ pháp và từ vựng
+- Giải thích đơn giản khi dạy biểu hiện mới
+- Đặt câu hỏi để tiếp tục hội thoại
+
+【Quy tắc】
+- Sử dụng ngữ pháp và từ vựng cấp độ {level}
+- Trả lời không quá dài (khoảng 2-3 câu)
+- Sử dụng đúng hiragana, katakana, kanji
+- Giọng điệu tự nhiên, thân thiện
+- Tuyệt đối không sử dụng tiếng Anh"""
@@ -1,57 +1,175 @@
 ﻿from __future__ import annotations
 
 import json
+import logging
+import orjson
+import re
 import requests
-from typing import Dict, List
+from requests.adapters import HTTPAdapter
+from typing import Dict, Iterable, Iterator, List
+from urllib3.util.retry import Retry
 from .base_ai_service import BaseAIService
 
+logger = logging.getLogger(__name__)
+
+# Nội dung code block markdown: ưu tiên block ```json, nếu không có thì block ``` đầu tiên
+# (block chưa đóng thì lấy tới hết chuỗi, giống cách split cũ)
+_JSON_FENCE_RE = re.compile(r"```json(.*?)(?:```|\Z)", re.DOTALL)
+_FENCE_RE = re.compile(r"```(.*?)(?:```|\Z)", re.DOTALL)
+
+
+def _build_session() -> requests.Session:
+    """
+    Tạo Session dùng chung cho các lần gọi API chat completions,
+    giữ kết nối keep-alive để không phải bắt tay TCP/TLS lại mỗi request
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        # Chỉ retry lỗi kết nối và các status báo request chưa được xử lý (429, 503);
+        # 500/502/504 có thể trả về sau khi upstream đã sinh (và tính tiền) completion nên không gửi lại.
+        # read=0 để không gửi lại request đã tới server khi bị timeout lúc chờ phản hồi
+        max_retries=Retry(
+            total=3,
+            read=0,
+            backoff_factor=0.3,
+            status_forcelist=(429, 503),
+            allowed_methods=frozenset({"POST"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        ),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Mỗi blueprint tạo OpenAIService riêng (một lần mỗi process), nên Session để ở cấp module
+# để các service dùng chung một connection pool
+_session = _build_session()
+
+# Câu trả lời khi gọi API chat thất bại
+_CHAT_ERROR_REPLY = "Xin lỗi, đã xảy ra lỗi khi tạo phản hồi. Vui lòng thử lại."
+
+# Dòng system hướng dẫn AI chuyên gia tiếng Nhật, trả về đúng JSON (giống nhau cho mọi lần phân tích)
+_ANALYZE_SYSTEM_MESSAGE = {"role": "system", "content": "Bạn là chuyên gia tiếng Nhật. Vui lòng trả lời chỉ bằng JSON."}
+
+
+def _iter_sse_deltas(response: requests.Response) -> Iterator[str]:
+    """
+    Đọc stream SSE của chat completions ("data: {...}" mỗi dòng, kết thúc bằng
+    "data: [DONE]") và trả về lần lượt từng đoạn delta.content
+    """
+    for line in response.iter_lines():
+        if not line.startswith(b"data:"):
+            continue  # Bỏ qua dòng trống, comment keep-alive (": ...") và các field SSE khác
+        payload = line[5:].strip()
+        if payload == b"[DONE]":
+            break
+        choices = orjson.loads(payload).get("choices")
+        if choices:
+            piece = (choices[0].get("delta") or {}).get("content")
+            if piece:
+                yield piece
+
 
 class OpenAIService(BaseAIService):
     """Triển khai dịch vụ AI sử dụng OpenAI API hoặc API tương thích ChatAnywhere"""
 
-    def chat(self, messages: List[Dict[str, str]], topic: str, level: str) -> str:
-        """Trả lời hội thoại dựa trên lịch sử trò chuyện"""
-        try:
-            # Kiểm tra API key và base_url có được thiết lập chưa
-            if not self.api_key:
-                raise ValueError("OPENAI_API_KEY chưa được thiết lập")
-            if not self.base_url:
-                raise ValueError("OPENAI_BASE_URL chưa được thiết lập")
+    def __init__(self, api_key: str, base_url: str, model: str, timeout: int = 30):
+        super().__init__(api_key, base_url, model, timeout)
+        # Header dựng sẵn một lần cho mọi request
+        self._headers = {
+            "Authorization": f"Bearer {api_key}",  # Header xác thực
+            "Content-Type": "application/json"
+        }
+        # Phần cố định của request body, mỗi lần gọi chỉ cần thêm "messages"
+        self._chat_base = {
+            "model": model,  # Model AI đang sử dụng (ví dụ: gpt-4)
+            "temperature": 0.7,  # Độ sáng tạo câu trả lời
+            "max_tokens": 500  # Giới hạn số token (đơn vị tính độ dài câu)
+        }
+        self._analyze_base = {
+            "model": model,
+            "temperature": 0.3,  # Thấp để kết quả ổn định hơn
+            "max_tokens": 500
+        }
 
-            # Tạo prompt hệ thống dựa trên topic và level
-            system_prompt = self.build_system_prompt(topic, level)
+    def _post_chat(self, messages: Iterable[Dict[str, str]], topic: str, level: str, stream: bool) -> requests.Response:
+        """Gửi request chat completions, trả về response (caller tự kiểm tra HTTP status)"""
+        # Kiểm tra API key và base_url có được thiết lập chưa
+        if not self.api_key:
+            raise ValueError("OPENAI_API_KEY chưa được thiết lập")
+        if not self.base_url:
+            raise ValueError("OPENAI_BASE_URL chưa được thiết lập")
 
-            # Ghép prompt hệ thống vào đầu danh sách message để gửi cho API
-            full_messages = [{"role": "system", "content": system_prompt}] + messages
+        # Tạo prompt hệ thống dựa trên topic và level
+        system_prompt = self.build_system_prompt(topic, level)
 
-            # Địa chỉ endpoint API chat completion
-            url = f"{self.base_url.rstrip('/')}/chat/completions"
-            print(f"[OpenAI] Gọi API chat: {url}")
+        # Ghép prompt hệ thống vào đầu danh sách message để gửi cho API
+        # messages có thể là generator (Conversation.iter_chat_history) nên unpack trực tiếp
+        full_messages = [{"role": "system", "content": system_prompt}, *messages]
 
-            # Gửi POST request đến API OpenAI
-            response = requests.post(
-                url,
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",  # Header xác thực
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": self.model,  # Model AI đang sử dụng (ví dụ: gpt-4)
-                    "messages": full_messages,  # Toàn bộ message chat history
-                    "temperature": 0.7,  # Độ sáng tạo câu trả lời
-                    "max_tokens": 500  # Giới hạn số token (đơn vị tính độ dài câu)
-                },
-                timeout=self.timeout  # Timeout request
-            )
+        # Địa chỉ endpoint API chat completion
+        url = f"{self.base_url.rstrip('/')}/chat/completions"
+        logger.debug("[OpenAI] Gọi API chat: %s (stream=%s)", url, stream)
 
-            # Log trạng thái trả về
-            print(f"[OpenAI] Trạng thái phản hồi: {response.status_code}")
+        body = {
+            **self._chat_base,
+            "messages": full_messages,  # Toàn bộ message chat history
+        }
+        if stream:
+            body["stream"] = True  # API trả về từng token qua SSE thay vì chờ đủ cả câu trả lời
 
-            # Nếu HTTP error, raise exception
+        # Gửi POST request đến API OpenAI
+        response = _session.post(
+            url,
+            headers=self._headers,
+            # Serialize body bằng orjson, Content-Type đã có trong self._headers
+            data=orjson.dumps(body),
+            timeout=self.timeout,  # Timeout request
+            stream=stream
+        )
+
+        # Log trạng thái trả về
+        logger.debug("[OpenAI] Trạng thái phản hồi: %s", response.status_code)
+        return response
+
+    def stream_chat(self, messages: Iterable[Dict[str, str]], topic: str, level: str) -> Iterator[str]:
+        """
+        Trả lời hội thoại dạng stream: yield từng đoạn nội dung ngay khi API gửi về,
+        người dùng thấy token đầu tiên mà không phải chờ toàn bộ câu trả lời.
+        Lỗi request được raise cho caller xử lý.
+        """
+        with self._post_chat(messages, topic, level, stream=True) as response:
             response.raise_for_status()
+            yield from _iter_sse_deltas(response)
+
+    def chat(self, messages: Iterable[Dict[str, str]], topic: str, level: str, stream: bool = False) -> str:
+        """
+        Trả lời hội thoại dựa trên lịch sử trò chuyện
+
+        stream=True đọc câu trả lời qua SSE (stream_chat) rồi ghép lại thành một chuỗi
+        """
+        try:
+            if stream:
+                content = ''.join(self.stream_chat(messages, topic, level)).strip()
+                logger.debug("[OpenAI] Chat stream thành công, độ dài nội dung: %d", len(content))
+                return content
+
+            response = self._post_chat(messages, topic, level, stream=False)
+
+            # HTTP error: log rồi trả câu trả lời dự phòng luôn, không tạo HTTPError
+            # và chỉ đọc response.text khi log WARNING thực sự được bật
+            status_code = response.status_code
+            if status_code >= 400:
+                if logger.isEnabledFor(logging.WARNING):
+                    logger.warning("[OpenAI Error chat] HTTP %d: %.500s", status_code, response.text)
+                return _CHAT_ERROR_REPLY
 
             # Parse dữ liệu JSON trả về
-            data = response.json()
+            data = orjson.loads(response.content)
 
             # Kiểm tra cấu trúc response có hợp lệ không
             if "choices" not in data or len(data["choices"]) == 0:
@@ -59,26 +177,24 @@ class OpenAIService(BaseAIService):
 
             # Lấy nội dung câu trả lời từ AI
             content = data["choices"][0]["message"]["content"].strip()
-            print(f"[OpenAI] Chat thành công, độ dài nội dung: {len(content)}")
+            logger.debug("[OpenAI] Chat thành công, độ dài nội dung: %d", len(content))
 
             return content
 
         except requests.exceptions.RequestException as e:
             # Bắt lỗi khi gọi API bị lỗi (timeout, kết nối...)
-            print(f"[OpenAI Error chat] Lỗi request: {e}")
+            logger.warning("[OpenAI Error chat] Lỗi request: %s", e)
             if hasattr(e, 'response') and e.response is not None:
-                print(f"[OpenAI Error chat] Phản hồi lỗi: {e.response.text}")
-            return "Xin lỗi, đã xảy ra lỗi khi tạo phản hồi. Vui lòng thử lại."
+                logger.warning("[OpenAI Error chat] Phản hồi lỗi: %s", e.response.text)
+            return _CHAT_ERROR_REPLY
         except KeyError as e:
             # Lỗi thiếu trường trong dữ liệu phản hồi JSON
-            print(f"[OpenAI Error chat] Thiếu khóa trong phản hồi: {e}")
+            logger.warning("[OpenAI Error chat] Thiếu khóa trong phản hồi: %s", e)
             return "Xin lỗi, đã xảy ra lỗi khi xử lý phản hồi từ API."
         except Exception as e:
             # Bắt các lỗi bất thường khác
-            print(f"[OpenAI Error chat] Lỗi không xác định: {type(e).__name__}: {e}")
-            import traceback
-            traceback.print_exc()
-            return "Xin lỗi, đã xảy ra lỗi khi tạo phản hồi. Vui lòng thử lại."
+            logger.exception("[OpenAI Error chat] Lỗi không xác định: %s: %s", type(e).__name__, e)
+            return _CHAT_ERROR_REPLY
 
     def analyze_message(self, message: str, level: str) -> Dict:
         """Phân tích câu tiếng Nhật (ngữ pháp, từ vựng, tự nhiên)"""
@@ -94,55 +210,55 @@ class OpenAIService(BaseAIService):
 
             # Endpoint API chat completions
             url = f"{self.base_url.rstrip('/')}/chat/completions"
-            print(f"[OpenAI] Gọi API phân tích: {url}")
+            logger.debug("[OpenAI] Gọi API phân tích: %s", url)
 
             # Gửi POST request để phân tích tin nhắn
-            response = requests.post(
+            response = _session.post(
                 url,
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": self.model,
+                headers=self._headers,
+                data=orjson.dumps({
+                    **self._analyze_base,
                     "messages": [
-                        # Dòng system hướng dẫn AI chuyên gia tiếng Nhật, trả về đúng JSON
-                        {"role": "system", "content": "Bạn là chuyên gia tiếng Nhật. Vui lòng trả lời chỉ bằng JSON."},
+                        _ANALYZE_SYSTEM_MESSAGE,
                         # Dòng user gửi prompt phân tích câu
                         {"role": "user", "content": prompt}
                     ],
-                    "temperature": 0.3,  # Thấp để kết quả ổn định hơn
-                    "max_tokens": 500
-                },
+                }),
                 timeout=self.timeout
             )
 
             # Log trạng thái response
-            print(f"[OpenAI] Phản hồi phân tích status: {response.status_code}")
+            status_code = response.status_code
+            logger.debug("[OpenAI] Phản hồi phân tích status: %s", status_code)
 
-            # Raise lỗi nếu HTTP error
-            response.raise_for_status()
+            # HTTP error: dùng phân tích mặc định luôn, không tạo HTTPError
+            if status_code >= 400:
+                if logger.isEnabledFor(logging.WARNING):
+                    logger.warning("[OpenAI Error analyze_message] HTTP %d: %.500s", status_code, response.text)
+                return self.get_fallback_analysis()
 
             # Parse JSON data
-            data = response.json()
+            data = orjson.loads(response.content)
 
             # Kiểm tra cấu trúc phản hồi hợp lệ
             if "choices" not in data or len(data["choices"]) == 0:
                 raise ValueError(f"Cấu trúc phản hồi không đúng: {data}")
 
             content = data["choices"][0]["message"]["content"].strip()
-            print(f"[OpenAI] Nội dung phản hồi phân tích: {content[:200]}...")
+            logger.debug("[OpenAI] Nội dung phản hồi phân tích: %.200s...", content)
 
             # Xử lý trường hợp AI trả về JSON trong code block markdown
-            content_clean = content
-            if "```json" in content:
-                content_clean = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content_clean = content.split("```")[1].split("```")[0].strip()
+            match = _JSON_FENCE_RE.search(content) or _FENCE_RE.search(content)
+            content_clean = match.group(1).strip() if match else content
 
             # Chuyển JSON string thành dict Python
-            analysis = json.loads(content_clean)
-            print(f"[OpenAI] Phân tích thành công: grammar score = {analysis.get('grammar', {}).get('score', 'N/A')}")
+            # orjson.JSONDecodeError kế thừa json.JSONDecodeError nên except bên dưới vẫn bắt được
+            analysis = orjson.loads(content_clean)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "[OpenAI] Phân tích thành công: grammar score = %s",
+                    analysis.get('grammar', {}).get('score', 'N/A'),
+                )
 
             # Trả về dict phân tích với mặc định nếu thiếu trường nào
             return {
@@ -165,22 +281,20 @@ class OpenAIService(BaseAIService):
 
         except json.JSONDecodeError as e:
             # Lỗi khi JSON trả về không hợp lệ
-            print(f"[OpenAI Error analyze_message] Lỗi decode JSON: {e}")
-            print(f"[OpenAI Error analyze_message] Nội dung lỗi: {content[:500]}")
+            logger.warning("[OpenAI Error analyze_message] Lỗi decode JSON: %s", e)
+            logger.warning("[OpenAI Error analyze_message] Nội dung lỗi: %.500s", content)
             return self.get_fallback_analysis()
         except requests.exceptions.RequestException as e:
             # Lỗi khi gọi API thất bại
-            print(f"[OpenAI Error analyze_message] Lỗi request: {e}")
+            logger.warning("[OpenAI Error analyze_message] Lỗi request: %s", e)
             if hasattr(e, 'response') and e.response is not None:
-                print(f"[OpenAI Error analyze_message] Phản hồi lỗi: {e.response.text}")
+                logger.warning("[OpenAI Error analyze_message] Phản hồi lỗi: %s", e.response.text)
             return self.get_fallback_analysis()
         except KeyError as e:
             # Thiếu key trong response JSON
-            print(f"[OpenAI Error analyze_message] Thiếu khóa trong phản hồi: {e}")
+            logger.warning("[OpenAI Error analyze_message] Thiếu khóa trong phản hồi: %s", e)
             return self.get_fallback_analysis()
         except Exception as e:
             # Lỗi không xác định khác
-            print(f"[OpenAI Error analyze_message] Lỗi không xác định: {type(e).__name__}: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("[OpenAI Error analyze_message] Lỗi không xác định: %s: %s", type(e).__name__, e)
             return self.get_fallback_analysis()
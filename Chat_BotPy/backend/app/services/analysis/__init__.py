@@ -1,18 +1,31 @@
 ﻿"""
 Analysis services package
+
+Analyzers are imported lazily on first attribute access (PEP 562), so
+importing one submodule does not load the other five.
 """
-from .grammar_analyzer import GrammarAnalyzer
-from .vocabulary_analyzer import VocabularyAnalyzer
-from .fluency_analyzer import FluencyAnalyzer
-from .keigo_analyzer import KeigoAnalyzer
-from .jlpt_level_estimator import JLPTLevelEstimator
-from .particle_analyzer import ParticleAnalyzer
+from importlib import import_module
+
+_LAZY = {
+    'GrammarAnalyzer': '.grammar_analyzer',
+    'VocabularyAnalyzer': '.vocabulary_analyzer',
+    'FluencyAnalyzer': '.fluency_analyzer',
+    'KeigoAnalyzer': '.keigo_analyzer',
+    'JLPTLevelEstimator': '.jlpt_level_estimator',
+    'ParticleAnalyzer': '.particle_analyzer',
+}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
 
-__all__ = [
-    'GrammarAnalyzer',
-    'VocabularyAnalyzer',
-    'FluencyAnalyzer',
-    'KeigoAnalyzer',
-    'JLPTLevelEstimator',
-    'ParticleAnalyzer',
-]
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -2,8 +2,20 @@
 Fluency Analyzer
 Analyzes fluency based on response time and speech patterns
 """
+from bisect import bisect_right
 from typing import Dict, Any, Optional
 
+# Upper bounds (seconds, exclusive) of each response-time bucket; faster response = higher fluency
+_THRESHOLDS = (5, 10, 20, 30, 45)
+_BUCKETS = (
+    (10.0, 'excellent'),
+    (9.0, 'very_good'),
+    (8.0, 'good'),
+    (7.0, 'medium'),
+    (6.0, 'needs_improvement'),
+    (5.0, 'slow'),
+)
+
 
 class FluencyAnalyzer:
     """Analyzer for Japanese speaking fluency"""
@@ -32,24 +44,7 @@ class FluencyAnalyzer:
 
         # Calculate score based on response time
         # Faster response = higher fluency
-        if response_time_s < 5:
-            score = 10.0
-            level = 'excellent'
-        elif response_time_s < 10:
-            score = 9.0
-            level = 'very_good'
-        elif response_time_s < 20:
-            score = 8.0
-            level = 'good'
-        elif response_time_s < 30:
-            score = 7.0
-            level = 'medium'
-        elif response_time_s < 45:
-            score = 6.0
-            level = 'needs_improvement'
-        else:
-            score = 5.0
-            level = 'slow'
+        score, level = _BUCKETS[bisect_right(_THRESHOLDS, response_time_s)]
 
         suggestions = []
         if response_time_s > 30:
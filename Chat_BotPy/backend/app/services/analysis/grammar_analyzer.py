@@ -46,11 +46,6 @@ class GrammarAnalyzer:
             errors.append("Double particle detected")
             score -= 2.0
 
-        # Check verb conjugation
-        if '行く' in sentence and '行きます' not in sentence and '行った' not in sentence:
-            # Basic check - in production, use proper NLP
-            pass
-
         score = max(0.0, min(10.0, score))
 
         return {
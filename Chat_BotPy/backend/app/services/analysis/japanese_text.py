@@ -0,0 +1,15 @@
+"""
+Japanese text helpers shared by the analyzers
+"""
+import re
+
+# Hiragana, katakana and the CJK unified ideographs block
+_JAPANESE_RE = re.compile(r'[\u3040-\u30ff\u4e00-\u9fff]')
+
+
+def contains_japanese(text: str) -> bool:
+    """
+    True when text has at least one kana or kanji character. Every analyzer
+    pattern needs one, so text without any can skip those regex scans.
+    """
+    return _JAPANESE_RE.search(text) is not None
@@ -2,9 +2,46 @@
 JLPT Level Estimator
 Estimates JLPT level (N5-N1) based on grammar, vocabulary, and sentence complexity
 """
-from typing import Dict, Any, List, Optional
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
 import re
 
+# Everything that is not a kanji; stripping it leaves one string of kanji to measure
+_NON_KANJI_RE = re.compile(r'[^\u4e00-\u9faf]+')
+
+# Tie-break order when several levels share the top score: harder level wins
+_LEVEL_RANK = {'N1': 0, 'N2': 1, 'N3': 2, 'N4': 3, 'N5': 4}
+
+# evaluate() scores a whole transcript, which grows with every message and so
+# almost never repeats; only short texts go through the LRU cache
+_MAX_CACHED_TEXT_LEN = 512
+
+
+def _index_vocabulary(indicators: Dict[str, List[str]]) -> Dict[str, Tuple[str, ...]]:
+    """Map each vocabulary word to the levels that list it"""
+    index: Dict[str, List[str]] = {}
+    for level, words in indicators.items():
+        for word in words:
+            index.setdefault(word, []).append(level)
+    return {word: tuple(levels) for word, levels in index.items()}
+
+
+def _vocabulary_scanner(words) -> Optional[re.Pattern]:
+    """
+    Build one alternation that finds every word present in a single pass.
+
+    A non-overlapping scan can only miss a word if it contains another word
+    or shares a suffix/prefix with one, so None is returned in that case and
+    callers fall back to per-word substring checks.
+    """
+    for a in words:
+        for b in words:
+            if a == b:
+                continue
+            if a in b or any(a[-k:] == b[:k] for k in range(1, min(len(a), len(b)))):
+                return None
+    return re.compile('|'.join(map(re.escape, words)))
+
 
 class JLPTLevelEstimator:
     """Estimates JLPT level from Japanese text"""
@@ -43,6 +80,14 @@ class JLPTLevelEstimator:
         ]
     }
 
+    # One alternation per level, compiled once at class load. The patterns are
+    # plain literals, so a level with no alternation hit can be skipped after a
+    # single scan; levels that do hit count each present pattern with `in`.
+    _LEVEL_ALT = {
+        level: re.compile('|'.join(map(re.escape, patterns)))
+        for level, patterns in JLPT_GRAMMAR_PATTERNS.items()
+    }
+
     # Vocabulary complexity indicators
     VOCABULARY_INDICATORS = {
         'N5': ['私', 'あなた', 'これ', 'それ', 'あれ', '食べる', '飲む', '行く', '来る'],
@@ -51,6 +96,8 @@ class JLPTLevelEstimator:
         'N2': ['実施', '促進', '改善', '対応', '検討', '確認', '調整'],
         'N1': ['実施', '促進', '改善', '対応', '検討', '確認', '調整', '抽象的', '具体的']
     }
+    _VOCAB_LEVELS = _index_vocabulary(VOCABULARY_INDICATORS)
+    _VOCAB_RE = _vocabulary_scanner(list(_VOCAB_LEVELS))
 
     @staticmethod
     def estimate(text: str, target_level: Optional[str] = None) -> Dict[str, Any]:
@@ -72,6 +119,43 @@ class JLPTLevelEstimator:
             }
 
         text = text.strip()
+        (
+            scores,
+            estimated_level,
+            max_score,
+            confidence,
+            sentence_length,
+            kanji_ratio,
+        ) = JLPTLevelEstimator._scores(text)
+
+        return {
+            'estimated_level': estimated_level,
+            'confidence': round(confidence, 2),
+            'level_scores': dict(scores),
+            # Compare with target level if provided; the cached scan above is target-independent
+            'matches_target': bool(target_level) and estimated_level == target_level,
+            'indicators': {
+                'sentence_length': sentence_length,
+                'kanji_ratio': round(kanji_ratio, 2),
+                'has_complex_grammar': max_score > 2
+            }
+        }
+
+    @staticmethod
+    def _scores(text: str) -> Tuple[Tuple[Tuple[str, float], ...], str, float, float, int, float]:
+        """Scores for stripped text, memoized unless text is longer than _MAX_CACHED_TEXT_LEN"""
+        if len(text) > _MAX_CACHED_TEXT_LEN:
+            return JLPTLevelEstimator._score_text(text)
+        return JLPTLevelEstimator._cached_score_text(text)
+
+    @staticmethod
+    def _score_text(text: str) -> Tuple[Tuple[Tuple[str, float], ...], str, float, float, int, float]:
+        """
+        Score stripped text against every level.
+
+        Pure function of the text, so results can be memoized; estimate()
+        builds a fresh result dict from the returned tuple on every call.
+        """
         level_scores = {
             'N5': 0,
             'N4': 0,
@@ -82,19 +166,25 @@ class JLPTLevelEstimator:
 
         # Check grammar patterns
         for level, patterns in JLPTLevelEstimator.JLPT_GRAMMAR_PATTERNS.items():
-            for pattern in patterns:
-                if re.search(pattern, text):
-                    level_scores[level] += 1
-
-        # Check vocabulary
-        for level, vocab_list in JLPTLevelEstimator.VOCABULARY_INDICATORS.items():
-            for vocab in vocab_list:
-                if vocab in text:
-                    level_scores[level] += 0.5
+            if JLPTLevelEstimator._LEVEL_ALT[level].search(text):
+                for pattern in patterns:
+                    if pattern in text:
+                        level_scores[level] += 1
+
+        # Check vocabulary: each distinct word present scores for every level listing it
+        vocab_levels = JLPTLevelEstimator._VOCAB_LEVELS
+        scanner = JLPTLevelEstimator._VOCAB_RE
+        if scanner is not None:
+            found = set(scanner.findall(text))
+        else:
+            found = [vocab for vocab in vocab_levels if vocab in text]
+        for vocab in found:
+            for level in vocab_levels[vocab]:
+                level_scores[level] += 0.5
 
         # Sentence complexity (length, kanji ratio)
         sentence_length = len(text)
-        kanji_count = len(re.findall(r'[\u4e00-\u9faf]', text))
+        kanji_count = len(_NON_KANJI_RE.sub('', text))
         kanji_ratio = kanji_count / sentence_length if sentence_length > 0 else 0
 
         # Adjust scores based on complexity
@@ -107,37 +197,38 @@ class JLPTLevelEstimator:
         if kanji_ratio > 0.5:
             level_scores['N1'] += 2
 
-        # Determine estimated level
-        max_score = max(level_scores.values())
-        estimated_level = 'N5'  # Default
-
-        # Find highest scoring level
-        for level in ['N1', 'N2', 'N3', 'N4', 'N5']:
-            if level_scores[level] == max_score:
-                estimated_level = level
-                break
+        # Determine estimated level: highest score, ties go to the harder level
+        estimated_level, max_score = max(
+            level_scores.items(),
+            key=lambda item: (item[1], -_LEVEL_RANK[item[0]])
+        )
 
         # Calculate confidence (0-1)
         total_score = sum(level_scores.values())
         confidence = max_score / total_score if total_score > 0 else 0.0
         confidence = min(1.0, confidence)
 
-        # Compare with target level if provided
-        matches_target = False
-        if target_level:
-            matches_target = estimated_level == target_level
+        return (
+            tuple(level_scores.items()),
+            estimated_level,
+            max_score,
+            confidence,
+            sentence_length,
+            kanji_ratio,
+        )
 
-        return {
-            'estimated_level': estimated_level,
-            'confidence': round(confidence, 2),
-            'level_scores': level_scores,
-            'matches_target': matches_target,
-            'indicators': {
-                'sentence_length': sentence_length,
-                'kanji_ratio': round(kanji_ratio, 2),
-                'has_complex_grammar': max_score > 2
-            }
-        }
+    # Memoized _score_text (a staticmethod object is callable, so lru_cache can wrap it)
+    _cached_score_text = staticmethod(lru_cache(maxsize=2048)(_score_text))
+
+    @staticmethod
+    def estimate_level(text: str) -> str:
+        """
+        Estimated level only, same as estimate(text)['estimated_level'] but
+        without building the result dict (for callers that need just the level)
+        """
+        if not text:
+            return 'N5'
+        return JLPTLevelEstimator._scores(text.strip())[1]
 
     @staticmethod
     def get_level_from_estimation(estimation: Dict[str, Any]) -> str:
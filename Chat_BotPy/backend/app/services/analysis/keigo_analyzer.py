@@ -5,6 +5,8 @@ Detects and analyzes keigo usage in Japanese sentences
 from typing import Dict, Any, List, Optional
 import re
 
+from .japanese_text import contains_japanese
+
 
 class KeigoAnalyzer:
     """Analyzer for Japanese keigo (honorific language)"""
@@ -30,6 +32,14 @@ class KeigoAnalyzer:
         ('ます', 'いたします'),  # Wrong kenjougo usage
     ]
 
+    # One alternation per keigo type, so detection is a single regex scan per
+    # type instead of one re.search per pattern; dict order keeps keigo_types
+    # in KEIGO_PATTERNS order
+    _KEIGO_RE = {
+        keigo_type: re.compile('|'.join(patterns))
+        for keigo_type, patterns in KEIGO_PATTERNS.items()
+    }
+
     @staticmethod
     def analyze(sentence: str, context: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -52,23 +62,26 @@ class KeigoAnalyzer:
             }
 
         sentence = sentence.strip()
-        keigo_types = []
         errors = []
         suggestions = []
 
+        # Every keigo pattern and common mistake contains kana/kanji, so a
+        # sentence without any cannot match and skips the scans below
+        has_japanese = contains_japanese(sentence)
+
         # Detect keigo types
-        for keigo_type, patterns in KeigoAnalyzer.KEIGO_PATTERNS.items():
-            for pattern in patterns:
-                if re.search(pattern, sentence):
-                    if keigo_type not in keigo_types:
-                        keigo_types.append(keigo_type)
-                    break
-
-        # Check for common mistakes
-        for wrong, correct in KeigoAnalyzer.COMMON_MISTAKES:
-            if wrong in sentence and context == 'formal':
-                errors.append(f"Consider using '{correct}' instead of '{wrong}' in formal context")
-                suggestions.append(f"Replace '{wrong}' with '{correct}'")
+        keigo_types = [
+            keigo_type
+            for keigo_type, pattern in KeigoAnalyzer._KEIGO_RE.items()
+            if pattern.search(sentence)
+        ] if has_japanese else []
+
+        # Check for common mistakes (only reported in a formal context)
+        if context == 'formal' and has_japanese:
+            for wrong, correct in KeigoAnalyzer.COMMON_MISTAKES:
+                if wrong in sentence:
+                    errors.append(f"Consider using '{correct}' instead of '{wrong}' in formal context")
+                    suggestions.append(f"Replace '{wrong}' with '{correct}'")
 
         # Calculate score
         has_keigo = len(keigo_types) > 0
@@ -2,8 +2,15 @@
 Vocabulary Analyzer
 Analyzes Japanese vocabulary usage
 """
+import re
 from typing import Dict, Any, List, Optional
 
+from .japanese_text import contains_japanese
+
+# Everything outside the CJK kanji block; stripping it leaves only the kanji,
+# so counting runs in the regex engine instead of a per-character Python loop
+_NON_KANJI_RE = re.compile(r'[^\u4e00-\u9faf]+')
+
 
 class VocabularyAnalyzer:
     """Analyzer for Japanese vocabulary"""
@@ -31,8 +38,9 @@ class VocabularyAnalyzer:
         score = 7.0  # Default score
         suggestions = []
 
-        # Count kanji (more kanji = higher level vocabulary)
-        kanji_count = len([c for c in sentence if '\u4e00' <= c <= '\u9faf'])
+        # Count kanji (more kanji = higher level vocabulary); text without any
+        # kana/kanji has none, so the substitution is skipped
+        kanji_count = len(_NON_KANJI_RE.sub('', sentence)) if contains_japanese(sentence) else 0
         total_chars = len(sentence)
 
         if total_chars > 0:
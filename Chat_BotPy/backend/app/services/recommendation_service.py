@@ -1,8 +1,21 @@
 ﻿from __future__ import annotations
 
-from typing import List
+from typing import Dict, List
 
 from app.models.conversation import Conversation, Recommendation
+from app.services.scoring_service import ScoringService
+
+
+# Bảng ánh xạ từ điểm yếu sang category của khóa học
+_WEAKNESS_TO_CATEGORY = {
+    'grammar': 'grammar',       # Ngữ pháp
+    'vocabulary': 'vocabulary', # Từ vựng
+    'fluency': 'fluency',       # Lưu loát
+    'naturalness': 'conversation', # Tính tự nhiên khi giao tiếp
+}
+
+# Lý do đề xuất (bằng tiếng Nhật) cho từng điểm yếu, dựng sẵn một lần
+_REASONS = {area: f"{area} を強化しましょう" for area in _WEAKNESS_TO_CATEGORY}
 
 
 class RecommendationService:
@@ -20,46 +33,43 @@ class RecommendationService:
         recs: List[Recommendation] = []  # Danh sách lưu các đề xuất sẽ trả về
         score = conversation.overall_score  # Lấy điểm tổng thể conversation
 
-        # Bảng ánh xạ từ điểm yếu sang category của khóa học
-        weakness_to_category = {
-            'grammar': 'grammar',       # Ngữ pháp
-            'vocabulary': 'vocabulary', # Từ vựng
-            'fluency': 'fluency',       # Lưu loát
-            'naturalness': 'conversation', # Tính tự nhiên khi giao tiếp
-        }
-
         # Xác định các điểm yếu dựa trên ngưỡng 70 điểm
-        weaknesses = []
-        if score.grammar < 70:
-            weaknesses.append('grammar')       # Ngữ pháp yếu
-        if score.vocabulary < 70:
-            weaknesses.append('vocabulary')    # Từ vựng yếu
-        if score.fluency < 70:
-            weaknesses.append('fluency')       # Lưu loát kém
-        if score.naturalness < 70:
-            weaknesses.append('naturalness')   # Tự nhiên khi nói kém
+        # (grammar, vocabulary, fluency, naturalness theo đúng thứ tự này)
+        weaknesses = ScoringService.identify_weaknesses(score, threshold=70)
+
+        # Id khóa học theo đúng thứ tự courses (chỉ dựng khi có điểm yếu)
+        course_ids: List[str] = []
 
         # Dựa trên các điểm yếu, tìm khóa học phù hợp thuộc category tương ứng
-        for area in weaknesses:
-            cat = weakness_to_category.get(area)
+        if weaknesses:
+            # Gom id khóa học theo category một lần (mỗi course chỉ to_dict một lần),
+            # giữ nguyên thứ tự khóa học trong từng category
+            course_ids_by_category: Dict[str, List[str]] = {}
             for c in courses:
                 c_dict = c.to_dict()
-                # Nếu khóa học cùng category với điểm yếu thì đề xuất
-                if c_dict.get('category') == cat:
+                course_id = c_dict.get('id') or ''
+                course_ids.append(course_id)
+                course_ids_by_category.setdefault(c_dict.get('category'), []).append(course_id)
+
+            for area in weaknesses:
+                reason = _REASONS[area]  # Lý do đề xuất (bằng tiếng Nhật)
+                # Các khóa học cùng category với điểm yếu thì đề xuất
+                for course_id in course_ids_by_category.get(_WEAKNESS_TO_CATEGORY[area], ()):
                     recs.append(Recommendation(
                         type=area,                  # Loại đề xuất theo điểm yếu
-                        course_id=c_dict.get('id') or '',  # ID khóa học
-                        reason=f"{area} を強化しましょう"  # Lý do đề xuất (bằng tiếng Nhật)
+                        course_id=course_id,        # ID khóa học
+                        reason=reason
                     ))
 
         # Nếu không có đề xuất nào do không tìm được khóa học phù hợp
         # Thì fallback: đề xuất bất kỳ 3 khóa học đầu ở cấp độ hiện tại
         if not recs:
-            for c in courses[:3]:
-                c_dict = c.to_dict()
+            # Dùng lại id đã parse ở trên nếu có, tránh to_dict lần nữa
+            fallback_ids = course_ids[:3] or [c.to_dict().get('id') or '' for c in courses[:3]]
+            for course_id in fallback_ids:
                 recs.append(Recommendation(
                     type='general',                # Loại chung chung
-                    course_id=c_dict.get('id') or '',
+                    course_id=course_id,
                     reason='学習を続けましょう'  # Lý do: "Hãy tiếp tục học tập"
                 ))
 
@@ -1,7 +1,40 @@
-﻿from typing import List
+﻿from bisect import bisect_right
+from typing import List
 from app.models.conversation import Message, Score
 from app.config.settings import settings
 
+# Ngưỡng thời gian phản hồi trung bình (giây) và điểm lưu loát tương ứng
+_FLUENCY_THRESHOLDS = (5, 10, 20, 30, 45)
+_FLUENCY_SCORES = (100.0, 90.0, 80.0, 70.0, 60.0, 50.0)
+# Điểm lưu loát mặc định khi không có dữ liệu thời gian phản hồi
+_DEFAULT_FLUENCY = 70.0
+
+# Trọng số từng phần (settings là dataclass frozen nên đọc một lần khi import là đủ)
+_WEIGHTS = (
+    settings.GRAMMAR_WEIGHT,
+    settings.VOCABULARY_WEIGHT,
+    settings.FLUENCY_WEIGHT,
+    settings.NATURALNESS_WEIGHT,
+)
+
+# Tên các phần điểm theo thứ tự bit trong mặt nạ điểm yếu
+_AREA_NAMES = ('grammar', 'vocabulary', 'fluency', 'naturalness')
+# Chỉ có 16 tổ hợp điểm yếu: dựng sẵn danh sách tên cho từng mặt nạ
+_WEAKNESSES_BY_MASK = tuple(
+    tuple(name for bit, name in enumerate(_AREA_NAMES) if mask >> bit & 1)
+    for mask in range(1 << len(_AREA_NAMES))
+)
+
+
+def _weakness_mask(score: Score, threshold: int) -> int:
+    # Bit i bật khi phần _AREA_NAMES[i] dưới ngưỡng
+    return (
+        (score.grammar < threshold)
+        | (score.vocabulary < threshold) << 1
+        | (score.fluency < threshold) << 2
+        | (score.naturalness < threshold) << 3
+    )
+
 
 class ScoringService:
     """Service dùng để tính toán điểm số từ các message trong conversation"""
@@ -17,46 +50,48 @@ class ScoringService:
         Returns:
             Đối tượng Score chứa điểm từng phần và tổng điểm
         """
-        # Lọc ra chỉ những message của user có phần phân tích
-        user_messages = [
-            msg for msg in messages
-            if msg.role == 'user' and msg.analysis
-        ]
+        # Duyệt một lần: chỉ lấy message của user có phần phân tích, cộng dồn
+        # điểm ngữ pháp, từ vựng, tự nhiên và thời gian phản hồi
+        # (cố gắng parse thành số nếu AI trả về string)
+        to_number = ScoringService._to_number
+        grammar_total = vocabulary_total = naturalness_total = 0.0
+        response_total = 0.0
+        count = response_count = 0
+        for msg in messages:
+            analysis = msg.analysis
+            if msg.role != 'user' or not analysis:
+                continue
+            count += 1
+            grammar_total += to_number(analysis.grammar.get('score', 0))
+            vocabulary_total += to_number(analysis.vocabulary.get('score', 0))
+            naturalness_total += to_number(analysis.naturalness.get('score', 0))
+            response_time = analysis.response_time
+            if response_time is not None:
+                response_total += to_number(response_time)
+                response_count += 1
 
         # Nếu không có message user nào có phân tích, trả về Score mặc định (0)
-        if not user_messages:
+        if not count:
             return Score()
 
-        # Lấy điểm ngữ pháp từ các message của user
-        # Lấy điểm (cố gắng parse thành số nếu AI trả về string)
-        grammar_scores = [
-            ScoringService._to_number(msg.analysis.grammar.get('score', 0))
-            for msg in user_messages
-        ]
-        # Lấy điểm từ vựng từ các message
-        vocabulary_scores = [
-            ScoringService._to_number(msg.analysis.vocabulary.get('score', 0))
-            for msg in user_messages
-        ]
-        # Lấy điểm tính tự nhiên (naturalness)
-        naturalness_scores = [
-            ScoringService._to_number(msg.analysis.naturalness.get('score', 0))
-            for msg in user_messages
-        ]
-
         # Tính điểm trung bình cho từng phần
-        grammar_score = ScoringService._average(grammar_scores)
-        vocabulary_score = ScoringService._average(vocabulary_scores)
-        naturalness_score = ScoringService._average(naturalness_scores)
-        # Tính điểm lưu loát dựa trên thời gian phản hồi
-        fluency_score = ScoringService._calculate_fluency_score(user_messages)
+        grammar_score = grammar_total / count
+        vocabulary_score = vocabulary_total / count
+        naturalness_score = naturalness_total / count
+        # Tính điểm lưu loát dựa trên thời gian phản hồi trung bình;
+        # không có response_time nào thì dùng luôn điểm mặc định
+        fluency_score = (
+            ScoringService._fluency_score(response_total / response_count)
+            if response_count else _DEFAULT_FLUENCY
+        )
 
         # Tính tổng điểm theo trọng số từng phần cấu hình trong settings
+        grammar_weight, vocabulary_weight, fluency_weight, naturalness_weight = _WEIGHTS
         total_score = (
-                grammar_score * settings.GRAMMAR_WEIGHT +
-                vocabulary_score * settings.VOCABULARY_WEIGHT +
-                fluency_score * settings.FLUENCY_WEIGHT +
-                naturalness_score * settings.NATURALNESS_WEIGHT
+                grammar_score * grammar_weight +
+                vocabulary_score * vocabulary_weight +
+                fluency_score * fluency_weight +
+                naturalness_score * naturalness_weight
         )
 
         # Trả về đối tượng Score với các điểm đã làm tròn
@@ -69,9 +104,9 @@ class ScoringService:
         )
 
     @staticmethod
-    def _calculate_fluency_score(messages: List[Message]) -> float:
+    def _fluency_score(avg_time_ms: float) -> float:
         """
-        Tính điểm lưu loát dựa trên thời gian phản hồi trung bình (response_time)
+        Tính điểm lưu loát dựa trên thời gian phản hồi trung bình (ms)
 
         Quy tắc chấm điểm:
         - Dưới 5 giây: 100 điểm
@@ -81,41 +116,9 @@ class ScoringService:
         - Dưới 45 giây: 60 điểm
         - Từ 45 giây trở lên: 50 điểm
         """
-        # Lấy danh sách thời gian phản hồi từ phân tích của các message
-        response_times = [
-            ScoringService._to_number(msg.analysis.response_time)
-            for msg in messages
-            if msg.analysis and msg.analysis.response_time is not None
-        ]
-
-        # Nếu không có dữ liệu thời gian phản hồi thì trả về điểm mặc định 70
-        if not response_times:
-            return 70.0
-
-        # Tính thời gian phản hồi trung bình (ms -> s)
-        avg_time_ms = sum(response_times) / len(response_times)
-        avg_time_s = avg_time_ms / 1000
-
-        # Xếp loại điểm theo thời gian trung bình
-        if avg_time_s < 5:
-            return 100.0
-        elif avg_time_s < 10:
-            return 90.0
-        elif avg_time_s < 20:
-            return 80.0
-        elif avg_time_s < 30:
-            return 70.0
-        elif avg_time_s < 45:
-            return 60.0
-        else:
-            return 50.0
-
-    @staticmethod
-    def _average(scores: List[float]) -> float:
-        """Tính điểm trung bình của một danh sách điểm"""
-        if not scores:
-            return 0.0
-        return sum(scores) / len(scores)
+        # Xếp loại điểm theo thời gian trung bình (ms -> s); "dưới" = so sánh
+        # chặt, nên dùng bisect_right để giá trị đúng bằng ngưỡng rơi vào mức sau
+        return _FLUENCY_SCORES[bisect_right(_FLUENCY_THRESHOLDS, avg_time_ms / 1000)]
 
     @staticmethod
     def _to_number(value, default: float = 0.0) -> float:
@@ -123,6 +126,9 @@ class ScoringService:
 
         Nếu không thể chuyển đổi, trả về default.
         """
+        # Đường tắt cho trường hợp thường gặp: điểm đã là số
+        if isinstance(value, (int, float)):
+            return value
         try:
             if value is None:
                 return default
@@ -142,15 +148,5 @@ class ScoringService:
         Returns:
             Danh sách tên các phần yếu (grammar, vocabulary, fluency, naturalness)
         """
-        weaknesses = []
-
-        if score.grammar < threshold:
-            weaknesses.append('grammar')
-        if score.vocabulary < threshold:
-            weaknesses.append('vocabulary')
-        if score.fluency < threshold:
-            weaknesses.append('fluency')
-        if score.naturalness < threshold:
-            weaknesses.append('naturalness')
-
-        return weaknesses
+        # Trả list mới để caller có thể sửa mà không ảnh hưởng bảng dựng sẵn
+        return list(_WEAKNESSES_BY_MASK[_weakness_mask(score, threshold)])
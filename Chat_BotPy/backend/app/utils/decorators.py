@@ -1,9 +1,13 @@
 ﻿
+import logging
 from functools import wraps
-from flask import request, jsonify
+from flask import g, request, jsonify, make_response
 from marshmallow import ValidationError
+from werkzeug.exceptions import HTTPException
 from app.auth.jwt_auth import require_auth as jwt_require_auth
+from app.config.settings import settings
 
+logger = logging.getLogger(__name__)
 
 
 def handle_errors(f):
@@ -19,8 +23,10 @@ def handle_errors(f):
             return jsonify({'error': str(e)}), 400
         except ValidationError as e:
             return jsonify({'error': 'Validation error', 'details': e.messages}), 400
-        except Exception as e:
-            print(f"Unexpected error: {e}")
+        except HTTPException as e:
+            return jsonify({'error': e.description}), e.code
+        except Exception:
+            logger.exception("Unexpected error in %s", f.__name__)
             return jsonify({'error': 'Internal server error'}), 500
 
     return decorated_function
@@ -30,6 +36,10 @@ def validate_json(schema):
     """
     Decorator to validate JSON request body
 
+    The body is deserialized once with ``schema.load`` and the loaded
+    result is stored on ``g.json_body``, so views read validated, typed
+    values from there instead of going back through ``request.get_json()``.
+
     Args:
         schema: Marshmallow schema instance
     """
@@ -42,10 +52,12 @@ def validate_json(schema):
             if not json_data:
                 return jsonify({'error': 'No JSON data provided'}), 400
 
-            # Validate with schema
-            errors = schema.validate(json_data)
-            if errors:
-                return jsonify({'error': 'Validation error', 'details': errors}), 400
+            # Validate with schema; load() does the same work as validate()
+            # but keeps the deserialized data instead of discarding it
+            try:
+                g.json_body = schema.load(json_data)
+            except ValidationError as e:
+                return jsonify({'error': 'Validation error', 'details': e.messages}), 400
 
             return f(*args, **kwargs)
 
@@ -54,5 +66,28 @@ def validate_json(schema):
     return decorator
 
 
+def conditional_get(f):
+    """
+    Decorator adding ETag / Cache-Control to successful GET responses
+
+    Views may set their own ETag (e.g. derived from ``updated_at``) and
+    answer 304 themselves before serializing; otherwise a weak ETag is
+    computed from the response body. When the ETag matches the request's
+    ``If-None-Match`` the response becomes a bodyless 304.
+    """
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        response = make_response(f(*args, **kwargs))
+        if response.status_code in (200, 304):
+            response.cache_control.private = True
+            response.cache_control.max_age = settings.HTTP_CACHE_MAX_AGE
+            response.add_etag(weak=True)  # keeps an ETag the view already set
+            response.make_conditional(request)
+        return response
+
+    return decorated_function
+
+
 def require_auth(f):
     return jwt_require_auth(f)
@@ -0,0 +1,49 @@
+"""
+Flask JSON provider backed by orjson
+"""
+import typing as t
+
+import orjson
+from flask.json.provider import DefaultJSONProvider
+from flask.wrappers import Response
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Drop-in replacement for Flask's default provider that serializes and
+    parses with orjson. Output matches DefaultJSONProvider: keys are sorted,
+    non-string keys are stringified and datetimes/UUIDs/dataclasses fall back
+    to Flask's own ``default`` handling.
+    """
+
+    _BASE_OPTIONS = (
+        orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+
+    def _dumps_bytes(self, obj: t.Any, **kwargs: t.Any) -> bytes:
+        option = self._BASE_OPTIONS
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        default = kwargs.get("default", self.default)
+        return orjson.dumps(obj, default=default, option=option)
+
+    def dumps(self, obj: t.Any, **kwargs: t.Any) -> str:
+        return self._dumps_bytes(obj, **kwargs).decode()
+
+    def response(self, *args: t.Any, **kwargs: t.Any) -> Response:
+        """
+        Same response as DefaultJSONProvider.response, but the orjson bytes
+        go straight into the body instead of being decoded to str and
+        encoded again by the response class.
+        """
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = self._dumps_bytes(obj, indent=indent)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+    def loads(self, s: str | bytes, **kwargs: t.Any) -> t.Any:
+        return orjson.loads(s)
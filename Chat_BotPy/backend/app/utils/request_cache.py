@@ -0,0 +1,23 @@
+"""
+Request-scoped memoization backed by flask.g
+"""
+from typing import Any, Callable, Hashable
+
+from flask import g, has_app_context
+
+
+def request_cached(namespace: str, key: Hashable, loader: Callable[[], Any]) -> Any:
+    """
+    Return the value cached under (namespace, key) for the current request,
+    calling loader() on the first lookup. Outside an app context the loader
+    is called directly, so callers work the same in scripts and tests.
+    """
+    if not has_app_context():
+        return loader()
+    cache = g.get(namespace)
+    if cache is None:
+        cache = {}
+        setattr(g, namespace, cache)
+    if key not in cache:
+        cache[key] = loader()
+    return cache[key]
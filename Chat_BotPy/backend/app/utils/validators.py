@@ -1 +1,45 @@
-﻿
+﻿"""
+Reusable marshmallow validators
+"""
+from marshmallow import ValidationError, validate
+
+
+class NotBlank(validate.Validator):
+    """
+    Reject strings that contain only whitespace.
+
+    Empty strings are left to validate.Length so a field never reports
+    both errors at once.
+    """
+
+    default_message = "Field cannot be empty or whitespace"
+
+    def __init__(self, *, error: str | None = None):
+        self.error = error or self.default_message
+
+    def _repr_args(self) -> str:
+        return f"error={self.error!r}"
+
+    def __call__(self, value: str) -> str:
+        if value and not value.strip():
+            raise ValidationError(self.error)
+        return value
+
+
+class OneOfSet(validate.OneOf):
+    """
+    validate.OneOf with O(1) membership: choices are kept in their given
+    order for the error message and mirrored into a frozenset for lookups.
+    """
+
+    def __init__(self, choices, labels=None, *, error: str | None = None):
+        super().__init__(choices, labels, error=error)
+        self.choice_set = frozenset(self.choices)
+
+    def __call__(self, value):
+        try:
+            if value not in self.choice_set:
+                raise ValidationError(self._format_error(value))
+        except TypeError as error:
+            raise ValidationError(self._format_error(value)) from error
+        return value
@@ -0,0 +1,18 @@
+"""
+Cấu hình gunicorn cho production (gunicorn tự đọc file này khi chạy trong thư mục backend)
+
+Các endpoint chủ yếu chờ I/O (MongoDB, AI provider, course-service) nên dùng
+worker gthread: mỗi process phục vụ nhiều request song song bằng thread, các
+thread dùng chung MongoClient, HTTP session và controller đã cache ở cấp module.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '5001')}")
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+# Lời gọi AI có thể mất vài chục giây (REQUEST_TIMEOUT), chừa thêm thời gian xử lý
+timeout = int(os.getenv("GUNICORN_TIMEOUT", int(os.getenv("REQUEST_TIMEOUT", 30)) + 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+wsgi_app = "app:create_app()"
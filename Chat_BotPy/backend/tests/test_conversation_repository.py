@@ -0,0 +1,115 @@
+"""
+ConversationRepository.migrate_message_timestamps and id handling
+
+Runs against mongomock, and also against a real MongoDB when
+MONGODB_TEST_URI is set (e.g. MONGODB_TEST_URI=mongodb://localhost:27017);
+a throwaway database is created and dropped for that run.
+"""
+import os
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+
+from app.models.conversation import Message
+from app.repositories.base_repository import to_object_id
+from app.repositories.conversation_repository import ConversationRepository
+
+# Formats written by Message.to_dict() (datetime.isoformat) plus offset/Z variants
+_STORED = [
+    '2024-05-01T10:20:30.123456',        # microseconds
+    '2024-05-01T10:20:30',               # isoformat() drops .000000
+    '2024-05-01T17:20:30.250000+07:00',  # with offset
+    '2024-05-01T10:20:30+00:00',
+    '2024-05-01T10:20:30Z',
+]
+
+
+def _as_stored(value: str) -> datetime:
+    # what MongoDB stores for a parsed timestamp: a UTC instant at millisecond precision
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.replace(microsecond=parsed.microsecond // 1000 * 1000)
+
+
+def _mongomock_collection():
+    mongomock = pytest.importorskip('mongomock')
+    yield mongomock.MongoClient().db.conversations
+
+
+def _mongodb_collection():
+    uri = os.getenv('MONGODB_TEST_URI')
+    if not uri:
+        pytest.skip('MONGODB_TEST_URI not set')
+    from pymongo import MongoClient
+    client = MongoClient(uri, serverSelectionTimeoutMS=3000)
+    db_name = f'chatbot_test_{uuid.uuid4().hex[:8]}'
+    try:
+        yield client[db_name].conversations
+    finally:
+        client.drop_database(db_name)
+        client.close()
+
+
+@pytest.fixture(params=['mongomock', 'mongodb'])
+def collection(request):
+    factory = _mongomock_collection if request.param == 'mongomock' else _mongodb_collection
+    yield from factory()
+
+
+def _message(timestamp):
+    return {'role': 'user', 'content': 'こんにちは', 'timestamp': timestamp, 'analysis': None}
+
+
+def test_migrate_message_timestamps(collection):
+    already_date = datetime(2024, 5, 2, 8, 0, 0)
+    legacy_id, mixed_id, bad_id, new_id, empty_id = (ObjectId() for _ in range(5))
+    collection.insert_many([
+        {'_id': legacy_id, 'user_id': 'u1', 'messages': [_message(ts) for ts in _STORED]},
+        {'_id': mixed_id, 'user_id': 'u1', 'messages': [_message(already_date), _message(_STORED[0])]},
+        {'_id': bad_id, 'user_id': 'u1', 'messages': [_message('yesterday'), _message(_STORED[1])]},
+        {'_id': new_id, 'user_id': 'u1', 'messages': [_message(already_date)]},
+        {'_id': empty_id, 'user_id': 'u1', 'messages': []},
+    ])
+    repo = ConversationRepository(collection)
+
+    assert repo.migrate_message_timestamps() == 3
+
+    def timestamps(doc_id):
+        return [m['timestamp'] for m in collection.find_one({'_id': doc_id})['messages']]
+
+    assert timestamps(legacy_id) == [_as_stored(ts) for ts in _STORED]
+    assert timestamps(mixed_id) == [already_date, _as_stored(_STORED[0])]
+    # unparseable strings are left for the read path, the rest of the document is migrated
+    assert timestamps(bad_id) == ['yesterday', _as_stored(_STORED[1])]
+    assert timestamps(new_id) == [already_date]
+    # other message fields are untouched
+    assert collection.find_one({'_id': legacy_id})['messages'][0]['content'] == 'こんにちは'
+
+    # re-running is a no-op
+    before = list(collection.find().sort('_id'))
+    assert repo.migrate_message_timestamps() == 0
+    assert list(collection.find().sort('_id')) == before
+
+    # reading migrated data gives the same instants the string read path produced
+    conversation = repo.find_by_id(str(legacy_id))
+    assert [m.timestamp for m in conversation.messages] == [
+        _as_stored(Message.from_dict(_message(ts)).timestamp.isoformat()) for ts in _STORED
+    ]
+
+
+def test_to_object_id_caches_only_strings():
+    oid = ObjectId()
+    assert to_object_id(str(oid)) is to_object_id(str(oid)) == oid
+    assert to_object_id(oid) == oid
+    # None still means "a new id", as with ObjectId(None)
+    assert to_object_id(None) != to_object_id(None)
+
+
+@pytest.mark.parametrize('bad_id', ['not-an-id', 42, ['x'], {}], ids=['bad-str', 'int', 'list', 'dict'])
+def test_invalid_ids_are_rejected_not_raised(collection, bad_id):
+    repo = ConversationRepository(collection)
+    assert repo.find_by_id(bad_id) is None
+    assert repo.delete(bad_id) is False
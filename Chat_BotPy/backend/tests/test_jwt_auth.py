@@ -0,0 +1,223 @@
+"""
+Parity tests: verify_jwt must accept and reject exactly what the
+pyjwt.decode call it replaced did, with the same exception types and
+messages.
+"""
+import json
+import time
+from types import SimpleNamespace
+
+import jwt as pyjwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jwt.algorithms import RSAAlgorithm
+from jwt.utils import base64url_encode
+
+from app.auth import jwt_auth
+
+AUDIENCE = "chatbot-client"
+ISSUER = "https://keycloak.example/realms/app"
+KID = "test-kid"
+
+_PRIVATE_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+_PUBLIC_KEY = _PRIVATE_KEY.public_key()
+_OTHER_PRIVATE_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+_EC_PUBLIC_KEY = ec.generate_private_key(ec.SECP256R1()).public_key()
+_RS256 = RSAAlgorithm(RSAAlgorithm.SHA256)
+
+
+class _StubJWKSClient:
+    def get_signing_key(self, kid):
+        return SimpleNamespace(key=_PUBLIC_KEY)
+
+
+@pytest.fixture(params=[(AUDIENCE, ISSUER), (None, None)], ids=["aud+iss", "no-aud-iss"])
+def settings_case(request, monkeypatch):
+    audience, issuer = request.param
+    monkeypatch.setattr(jwt_auth, "_AUD", audience)
+    monkeypatch.setattr(jwt_auth, "_ISS", issuer)
+    monkeypatch.setattr(jwt_auth, "get_jwks_client", lambda: _StubJWKSClient())
+    monkeypatch.setattr(jwt_auth, "_key_cache", {})
+    return audience, issuer
+
+
+def _reference_decode(token, audience, issuer):
+    # the implementation verify_jwt replaced: header parsed first, then pyjwt.decode
+    pyjwt.get_unverified_header(token)
+    return pyjwt.decode(
+        token,
+        key=_PUBLIC_KEY,
+        algorithms=("RS256",),
+        audience=audience,
+        issuer=issuer,
+        options={
+            "verify_signature": True,
+            "verify_aud": bool(audience),
+            "verify_exp": True,
+            "verify_iss": bool(issuer),
+        },
+    )
+
+
+def _outcome(fn, *args):
+    try:
+        return "ok", fn(*args)
+    except Exception as e:  # compare the failure itself, not just "it failed"
+        return type(e), str(e)
+
+
+def _assert_parity(token, settings_case):
+    audience, issuer = settings_case
+    expected = _outcome(_reference_decode, token, audience, issuer)
+    actual = _outcome(jwt_auth.verify_jwt, token)
+    assert actual == expected
+    return actual
+
+
+def _claims(**overrides):
+    now = int(time.time())
+    claims = {
+        "sub": "user-1",
+        "aud": AUDIENCE,
+        "iss": ISSUER,
+        "iat": now - 10,
+        "nbf": now - 10,
+        "exp": now + 300,
+    }
+    claims.update(overrides)
+    return {k: v for k, v in claims.items() if v is not None}
+
+
+def _encode(claims, key=_PRIVATE_KEY, headers=None, algorithm="RS256"):
+    return pyjwt.encode(claims, key, algorithm=algorithm, headers={"kid": KID, **(headers or {})})
+
+
+def _signed_raw(header: dict, payload: bytes, key=_PRIVATE_KEY) -> str:
+    # sign arbitrary payload bytes, for payloads pyjwt.encode refuses to build
+    signing_input = base64url_encode(json.dumps(header).encode()) + b"." + base64url_encode(payload)
+    signature = _RS256.sign(signing_input, key)
+    return (signing_input + b"." + base64url_encode(signature)).decode()
+
+
+def test_valid_token(settings_case):
+    status, claims = _assert_parity(_encode(_claims()), settings_case)
+    assert status == "ok" and claims["sub"] == "user-1"
+
+
+@pytest.mark.parametrize("claims", [
+    _claims(exp=int(time.time()) - 5),
+    _claims(exp=int(time.time())),
+    _claims(exp="soon"),
+], ids=["expired", "expires-now", "exp-not-int"])
+def test_expiry(claims, settings_case):
+    _assert_parity(_encode(claims), settings_case)
+
+
+@pytest.mark.parametrize("claims", [
+    _claims(nbf=int(time.time()) + 600),
+    _claims(iat=int(time.time()) + 600),
+    _claims(nbf="later"),
+    _claims(iat="later"),
+], ids=["nbf-future", "iat-future", "nbf-not-int", "iat-not-int"])
+def test_not_yet_valid(claims, settings_case):
+    _assert_parity(_encode(claims), settings_case)
+
+
+@pytest.mark.parametrize("claims", [
+    _claims(aud="someone-else"),
+    _claims(aud=["someone-else", AUDIENCE]),
+    _claims(aud=["someone-else"]),
+    _claims(aud=None),
+    _claims(aud=""),
+    _claims(aud=[AUDIENCE, 1]),
+    _claims(aud=42),
+], ids=["wrong", "list-match", "list-miss", "missing", "empty", "list-non-str", "not-str"])
+def test_audience(claims, settings_case):
+    _assert_parity(_encode(claims), settings_case)
+
+
+@pytest.mark.parametrize("claims", [
+    _claims(iss="https://evil.example"),
+    _claims(iss=None),
+], ids=["wrong", "missing"])
+def test_issuer(claims, settings_case):
+    _assert_parity(_encode(claims), settings_case)
+
+
+def test_bad_signature(settings_case):
+    status, _ = _assert_parity(_encode(_claims(), key=_OTHER_PRIVATE_KEY), settings_case)
+    assert status is pyjwt.InvalidSignatureError
+
+
+def test_tampered_payload(settings_case):
+    header, _, signature = _encode(_claims()).split(".")
+    forged = base64url_encode(json.dumps(_claims(sub="admin")).encode()).decode()
+    _assert_parity(f"{header}.{forged}.{signature}", settings_case)
+
+
+def test_failed_signature_keeps_cached_key(settings_case, monkeypatch):
+    # a forged token with a real kid: one verify, no JWKS lookup, no eviction
+    cached = _RS256.prepare_key(_PUBLIC_KEY)
+    monkeypatch.setattr(jwt_auth, "_key_cache", {KID: cached})
+    monkeypatch.setattr(jwt_auth, "get_jwks_client", lambda: pytest.fail("JWKS must not be consulted"))
+    with pytest.raises(pyjwt.InvalidSignatureError):
+        jwt_auth.verify_jwt(_encode(_claims(), key=_OTHER_PRIVATE_KEY))
+    assert jwt_auth._key_cache == {KID: cached}
+
+
+def test_invalid_key_refreshes_jwks_once(settings_case, monkeypatch):
+    class _RotatingJWKSClient:
+        def __init__(self):
+            self.refreshes = 0
+
+        def get_signing_keys(self, refresh=False):
+            self.refreshes += refresh
+
+        def get_signing_key(self, kid):
+            # before the refresh the kid still maps to a key of another type
+            return SimpleNamespace(key=_PUBLIC_KEY if self.refreshes else _EC_PUBLIC_KEY)
+
+    client = _RotatingJWKSClient()
+    monkeypatch.setattr(jwt_auth, "get_jwks_client", lambda: client)
+    status, _ = _assert_parity(_encode(_claims()), settings_case)
+    assert status == "ok" and client.refreshes == 1
+    assert KID in jwt_auth._key_cache
+
+
+@pytest.mark.parametrize("algorithm,key", [
+    ("HS256", "shared-secret"),
+    ("none", None),
+    ("RS512", _PRIVATE_KEY),
+], ids=["hs256", "none", "rs512"])
+def test_wrong_alg(algorithm, key, settings_case):
+    status, _ = _assert_parity(_encode(_claims(), key=key, algorithm=algorithm), settings_case)
+    assert status is pyjwt.InvalidAlgorithmError
+
+
+def test_missing_alg(settings_case):
+    _assert_parity(_signed_raw({"kid": KID}, json.dumps(_claims()).encode()), settings_case)
+
+
+def test_non_string_kid(settings_case):
+    _assert_parity(_signed_raw({"alg": "RS256", "kid": 7}, json.dumps(_claims()).encode()), settings_case)
+
+
+@pytest.mark.parametrize("token", [
+    "",
+    "abc",
+    "abc.def",
+    "!!!.e30.c2ln",
+    "e30.!!!.c2ln",
+    "e30.e30.!!!",
+    base64url_encode(b"not json").decode() + ".e30.c2ln",
+    base64url_encode(b"[1, 2]").decode() + ".e30.c2ln",
+], ids=["empty", "one-segment", "two-segments", "bad-header-b64", "bad-payload-b64",
+        "bad-signature-b64", "header-not-json", "header-not-object"])
+def test_malformed(token, settings_case):
+    status, _ = _assert_parity(token, settings_case)
+    assert status != "ok"
+
+
+@pytest.mark.parametrize("payload", [b"not json", b"[1, 2]"], ids=["not-json", "not-object"])
+def test_malformed_signed_payload(payload, settings_case):
+    _assert_parity(_signed_raw({"alg": "RS256", "kid": KID}, payload), settings_case)